@@ -163,12 +163,38 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Caching
 CACHES = {
+    # Счетчики попаданий по префиксам ключей (см. core/cache/instrumented.py, команда cache_stats)
     'default': {
-        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
-        'LOCATION': 'cache_table',
+        'BACKEND': 'core.cache.instrumented.InstrumentedCache',
+        'OPTIONS': {
+            'CACHE': 'tiered',
+            'FLUSH_INTERVAL': 30,  # запись счетчиков воркера в БД раз в 30 секунд
+        }
+    },
+    # L1 в памяти воркера перед общим кэшем в БД (см. core/cache/tiered.py)
+    'tiered': {
+        'BACKEND': 'core.cache.tiered.TieredCache',
+        'TIMEOUT': 300,  # 5 минут
+        'OPTIONS': {
+            'L2': 'shared',
+            'MAX_ENTRIES': 5000,  # записей в памяти одного воркера
+            'L1_TIMEOUT': 60,  # не дольше минуты в памяти воркера
+            'SYNC_INTERVAL': 1,  # сверка штампа версии раз в секунду
+            # Версии пространств имен (core/cache/invalidation.py) читаются только из общего кэша
+            'L2_ONLY_PREFIXES': ['ns_version:'],
+            'FLUSH_INTERVAL': 30,  # запись счетчиков уровней в БД раз в 30 секунд
+        }
+    },
+    # UNLOGGED таблица PostgreSQL (см. core/cache/postgres.py), создается командой create_cache_table
+    'shared': {
+        'BACKEND': 'core.cache.postgres.PostgresCache',
+        'LOCATION': 'cache_entries',
         'TIMEOUT': 300,  # 5 минут
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 20000,  # агрегаты админки живут часами (инвалидация по версиям)
+            'CULL_INTERVAL': 60,  # фоновая чистка истекших записей не чаще раза в минуту
+            'CULL_BATCH_SIZE': 1000,
+            'COMPRESS_MIN_LENGTH': 1024,  # сжимать значения от 1 КБ (HTML статистики)
         }
     }
 }
@@ -229,7 +255,7 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
 # Session configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
-SESSION_CACHE_ALIAS = 'default'
+SESSION_CACHE_ALIAS = 'shared'  # сессии не кэшируются в памяти воркера
 SESSION_COOKIE_AGE = 3600  # 1 час
 
 # Security
@@ -294,6 +320,9 @@ STORAGES = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Кэш скомпилированных структур листов для import_data
+IMPORT_LAYOUT_CACHE_DIR = BASE_DIR / 'cache' / 'import_layouts'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
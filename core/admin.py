@@ -1,12 +1,30 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import SEARCH_VAR
+from django.contrib.admin.widgets import AutocompleteSelect, get_select2_language
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import JsonResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.utils.safestring import mark_safe
-from django.core.cache import cache
 from django.db.models import Count, Avg, Prefetch, Q
+from django.db.models.functions import Greatest
 from django.db import connection
+import hashlib
 import logging
 
+from .aggregates import assessment_type_count, assessment_type_counts
+from .cache.invalidation import (AGGREGATE_TIMEOUT,
+                                 ASSESSMENT_TYPE,
+                                 STUDENT,
+                                 get_versions,
+                                 keys_for,
+                                 versioned_key,
+                                 )
+from .cache.registry import assessment_types, registry_for, sessions
+from .cache.stampede import get_many_or_compute, get_or_compute
+from .pagination import EstimatedCountPaginator, KeysetChangeList
 from .models import (Session,
                      Student, 
                      Course, 
@@ -16,12 +34,280 @@ from .models import (Session,
                      Attendance, 
                      Certificate,
                      Statistic,
+                     CourseAggregate,
+                     StudentAggregate,
                      )
 
 logger = logging.getLogger('core')
 
+# Вариантов на странице автодополнения и сколько страница хранится в кэше (секунды)
+CHOICES_PAGE_SIZE = 20
+CHOICES_TIMEOUT = 60
+
+class ReferenceListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по справочнику (сессии, типы зачетов): варианты из памяти процесса"""
+
+    def field_choices(self, field, request, model_admin):
+        registry = registry_for(field.related_model)
+        if registry is None:
+            return super().field_choices(field, request, model_admin)
+        return [(obj.pk, str(obj)) for obj in registry.all()]
+
+class AutocompleteListFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр по большой связанной таблице (студенты, предметы) с выбором через
+    автодополнение: в боковую панель попадает только выбранное значение,
+    варианты подгружаются по мере ввода из choices/ админки связанной модели
+    (OptimizedMixin.choices_view).
+    """
+    template = 'admin/autocomplete_list_filter.html'
+
+    def field_choices(self, field, request, model_admin):
+        opts = field.related_model._meta
+        self.choices_url = reverse(f'{model_admin.admin_site.name}:{opts.app_label}_{opts.model_name}_choices')
+        if not self.lookup_val:
+            return []
+        # Подпись только для выбранного значения
+        try:
+            return [(obj.pk, str(obj)) for obj in field.related_model._default_manager.filter(pk__in=self.lookup_val)]
+        except (ValueError, ValidationError):
+            return []
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # Адреса для скрипта фильтра: выбор значения и сброс
+        self.url_template = changelist.get_query_string({self.lookup_kwarg: '__value__'}, [self.lookup_kwarg_isnull])
+        self.clear_url = changelist.get_query_string(remove=[self.lookup_kwarg, self.lookup_kwarg_isnull])
+        yield from super().choices(changelist)
+
+    @staticmethod
+    def media():
+        extra = '' if settings.DEBUG else '.min'
+        language = get_select2_language()
+        return forms.Media(
+            js=(
+                f'admin/js/vendor/jquery/jquery{extra}.js',
+                f'admin/js/vendor/select2/select2.full{extra}.js',
+                *((f'admin/js/vendor/select2/i18n/{language}.js',) if language else ()),
+                'admin/js/jquery.init.js',
+                'core/admin/js/autocomplete_list_filter.js',
+            ),
+            css={'screen': (f'admin/css/vendor/select2/select2{extra}.css', 'admin/css/autocomplete.css')},
+        )
+
+class CachedAutocompleteSelect(AutocompleteSelect):
+    """
+    Виджет автодополнения для внешнего ключа: варианты - из choices/ админки
+    связанной модели, подпись выбранного значения - из ее choice_labels
+    (справочник или кэш) вместо запроса с __str__ по связанным объектам.
+    """
+
+    def related_admin(self):
+        return self.admin_site.get_model_admin(self.field.remote_field.model)
+
+    def get_url(self):
+        opts = self.field.remote_field.model._meta
+        return reverse(f'{self.admin_site.name}:{opts.app_label}_{opts.model_name}_choices')
+
+    def optgroups(self, name, value, attr=None):
+        default = (None, [], 0)
+        groups = [default]
+        if not self.is_required:
+            default[1].append(self.create_option(name, '', '', False, 0))
+        pk_field = self.field.remote_field.model._meta.pk
+        try:
+            pks = [pk_field.to_python(v) for v in value if str(v) not in self.choices.field.empty_values]
+        except ValidationError:
+            pks = []
+        labels = self.related_admin().choice_labels(pks)
+        for pk in pks:
+            if labels.get(pk) is not None:
+                default[1].append(self.create_option(name, pk, labels[pk], True, len(default[1])))
+        return groups
+
+class CounterListFilter(admin.SimpleListFilter):
+    """Фильтр по диапазонам счетчика: ranges - [(значение, подпись, условия filter)]"""
+    ranges = []
+
+    def lookups(self, request, model_admin):
+        return [(value, label) for value, label, _ in self.ranges]
+
+    def queryset(self, request, queryset):
+        for value, _, lookups in self.ranges:
+            if self.value() == value:
+                return queryset.filter(**lookups)
+        return queryset
+
+class SessionsCountFilter(CounterListFilter):
+    title = 'Сессий'
+    parameter_name = 'sessions_count'
+    ranges = [
+        ('0', 'Нет', {'aggregate__sessions_count': 0}),
+        ('1', '1', {'aggregate__sessions_count': 1}),
+        ('2-3', '2–3', {'aggregate__sessions_count__range': (2, 3)}),
+        ('4+', '4 и более', {'aggregate__sessions_count__gte': 4}),
+    ]
+
+class CertificatesCountFilter(CounterListFilter):
+    title = 'Сертификатов'
+    parameter_name = 'certificates_count'
+    ranges = [
+        ('0', 'Нет', {'aggregate__certificates_count': 0}),
+        ('1-5', '1–5', {'aggregate__certificates_count__range': (1, 5)}),
+        ('6+', '6 и более', {'aggregate__certificates_count__gte': 6}),
+    ]
+
+class AvgScoreFilter(CounterListFilter):
+    title = 'Средний балл'
+    parameter_name = 'avg_score'
+    ranges = [
+        ('none', 'Нет итоговых оценок', {'aggregate__final_count': 0}),
+        ('lt60', 'Ниже 60', {'aggregate__final_count__gt': 0, 'aggregate__avg_score__lt': 60}),
+        ('60-80', '60–80', {'aggregate__avg_score__gte': 60, 'aggregate__avg_score__lt': 80}),
+        ('80+', '80 и выше', {'aggregate__avg_score__gte': 80}),
+    ]
+
+def session_label(obj):
+    """Сессия объекта из справочника в памяти (без JOIN и запроса)"""
+    return str(sessions.get(obj.session_id))
+
+def session_number_label(obj):
+    return f"№{sessions.get(obj.session_id).session_number}"
+
 class OptimizedMixin:
-    """Миксин для оптимизации админки"""
+    """
+    Миксин для оптимизации админки.
+
+    batch_columns - вычисляемые колонки списка, которые считаются пакетом
+    на всю страницу: {имя: {'prefix', 'namespace', 'one', 'many'}}, где
+    one(pk) - значение для одного объекта, many(pks) - {pk: значение} одним
+    групповым запросом. Значения страницы читаются одним get_many, промахи
+    считаются групповыми запросами и записываются одним set_many.
+    Колонка получает значение через column_value(obj, имя).
+
+    keyset_pagination = True - постраничный вывод по курсору вместо OFFSET
+    (KeysetChangeList, core/pagination.py): для больших таблиц, которые
+    листают далеко вглубь. Нужен индекс в порядке сортировки списка.
+
+    search_rank_fields - поля, по похожести на строку поиска с которыми
+    сортируются результаты поиска (pg_trgm similarity, только PostgreSQL).
+    Сам поиск - стандартный icontains по search_fields: для него есть GIN
+    индексы pg_trgm (миграция 0019_trigram_search). Явная сортировка по
+    колонке (?o=) отменяет ранжирование.
+
+    choices/ - JSON варианты модели для автодополнения (AutocompleteListFilter,
+    CachedAutocompleteSelect). Внешние ключи из autocomplete_fields выводятся
+    виджетом CachedAutocompleteSelect; подписи объектов модели для виджетов -
+    choice_labels, label_related - select_related для __str__ модели.
+    """
+    batch_columns = {}
+    keyset_pagination = False
+    search_rank_fields = ()
+    label_related = ()
+    
+    @property
+    def media(self):
+        media = super().media
+        if any(isinstance(item, (list, tuple)) and issubclass(item[1], AutocompleteListFilter)
+               for item in self.list_filter):
+            media += AutocompleteListFilter.media()
+        return media
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if 'widget' not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            kwargs['widget'] = CachedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def label_queryset(self):
+        return self.model._default_manager.select_related(*self.label_related)
+    
+    def choice_labels(self, pks):
+        """
+        Подписи объектов {pk: str(obj)}: справочники - из памяти процесса,
+        остальное - из кэша, промахи - одним запросом с label_related.
+        Несуществующие pk в результат не попадают.
+        """
+        registry = registry_for(self.model)
+        if registry is not None:
+            return {obj.pk: str(obj) for obj in registry.all() if obj.pk in set(pks)}
+        model_name = self.model._meta.model_name
+        labels = get_many_or_compute(
+            {pk: f"admin_label_{model_name}_{pk}" for pk in pks},
+            lambda missing: {obj.pk: str(obj) for obj in self.label_queryset().filter(pk__in=missing)},
+            CHOICES_TIMEOUT,
+        )
+        return {pk: label for pk, label in labels.items() if label is not None}
+    
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('choices/', self.admin_site.admin_view(self.choices_view),
+                 name=f'{opts.app_label}_{opts.model_name}_choices'),
+            *super().get_urls(),
+        ]
+    
+    def choices_view(self, request):
+        """
+        Страница вариантов для автодополнения в формате select2: поиск по
+        search_fields, CHOICES_PAGE_SIZE вариантов, признак следующей
+        страницы без COUNT. Ответ кэшируется на CHOICES_TIMEOUT секунд.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        term = request.GET.get('term', '').strip()
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        digest = hashlib.md5(f"{self.model._meta.label}|{term}|{page}".encode()).hexdigest()[:15]
+        data = get_or_compute(
+            f"admin_choices_{int(digest, 16)}",
+            lambda: self.choices_page(request, term, page),
+            CHOICES_TIMEOUT,
+        )
+        return JsonResponse(data)
+    
+    def choices_page(self, request, term, page):
+        queryset = self.label_queryset()
+        if term:
+            queryset, _ = self.get_search_results(request, queryset, term)
+        ordering = [*(self.model._meta.ordering or ()), 'pk']
+        if self.search_rank_term(term) is not None:
+            ordering.insert(0, self.search_rank(term).desc())
+        offset = (page - 1) * CHOICES_PAGE_SIZE
+        objs = list(queryset.order_by(*ordering)[offset:offset + CHOICES_PAGE_SIZE + 1])
+        return {
+            'results': [{'id': str(obj.pk), 'text': str(obj)} for obj in objs[:CHOICES_PAGE_SIZE]],
+            'pagination': {'more': len(objs) > CHOICES_PAGE_SIZE},
+        }
+    
+    def get_ordering(self, request):
+        ordering = super().get_ordering(request)
+        term = self.search_rank_term(request.GET.get(SEARCH_VAR, ''))
+        if term is None:
+            return ordering
+        # Сначала самые похожие на строку поиска, затем обычный порядок
+        return [self.search_rank(term).desc(), *(ordering or self.model._meta.ordering)]
+    
+    def search_rank_term(self, term):
+        """Строка поиска для ранжирования или None (пустая, не PostgreSQL)"""
+        if not self.search_rank_fields or connection.vendor != 'postgresql':
+            return None
+        return term.strip() or None
+    
+    def search_rank(self, term):
+        """Похожесть объекта на строку поиска: наибольшая по search_rank_fields"""
+        from django.contrib.postgres.search import TrigramSimilarity
+        
+        similarities = [TrigramSimilarity(field, term) for field in self.search_rank_fields]
+        return similarities[0] if len(similarities) == 1 else Greatest(*similarities)
+    
+    def get_changelist(self, request, **kwargs):
+        if self.keyset_pagination:
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
     
     def get_queryset(self, request):
         """Оптимизируем запросы для списка объектов"""
@@ -29,18 +315,69 @@ class OptimizedMixin:
         if hasattr(self, 'optimize_queryset'):
             return self.optimize_queryset(qs)
         return qs
+    
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        self.resolve_batch_columns(changelist.result_list)
+        return changelist
+    
+    def resolve_batch_columns(self, objs):
+        """Считает batch_columns для объектов страницы и сохраняет значения в объектах"""
+        objs = list(objs)
+        if not self.batch_columns or not objs:
+            return
+        pks = [obj.pk for obj in objs]
+        versions = {}
+        keys = {}
+        for name, column in self.batch_columns.items():
+            namespace = column['namespace']
+            if namespace not in versions:
+                versions[namespace] = get_versions(namespace, pks, bulk=True)
+            for pk, key in keys_for(column['prefix'], versions[namespace]).items():
+                keys[(name, pk)] = key
+        
+        def compute_many(missing):
+            by_column = {}
+            for name, pk in missing:
+                by_column.setdefault(name, []).append(pk)
+            computed = {}
+            for name, column_pks in by_column.items():
+                values = self.batch_columns[name]['many'](column_pks)
+                computed.update(((name, pk), values.get(pk, 0)) for pk in column_pks)
+            return computed
+        
+        values = get_many_or_compute(keys, compute_many, AGGREGATE_TIMEOUT)
+        for obj in objs:
+            obj._batch_columns = {name: values[(name, obj.pk)] for name in self.batch_columns}
+    
+    def column_value(self, obj, name):
+        """Значение пакетной колонки; вне списка (например, в форме) - по одному объекту"""
+        batch = getattr(obj, '_batch_columns', None)
+        if batch is not None and name in batch:
+            return batch[name]
+        column = self.batch_columns[name]
+        return get_or_compute(
+            versioned_key(column['prefix'], column['namespace'], obj.pk),
+            lambda: column['one'](obj.pk),
+            AGGREGATE_TIMEOUT,
+        )
 
 class AttendanceInline(admin.TabularInline):
     """ Inline класс для записей о посещаемости """
     model = Attendance
     extra = 0
-    readonly_fields = ('session', 'present')
+    fields = ('get_session', 'present')
+    readonly_fields = ('get_session', 'present')
     verbose_name = "Посещаемость"
     verbose_name_plural = "Записи о посещаемости"
     can_delete = False
     show_change_link = False
     max_num = 10  # Ограничиваем количество
     
+    def get_session(self, obj):
+        return session_label(obj)
+    get_session.short_description = 'Сессия'
+    
     def has_add_permission(self, request, obj=None):
         return False
 
@@ -48,11 +385,16 @@ class AssessmentInline(admin.TabularInline):
     """ Inline класс для оценок """
     model = Assessment
     extra = 0
-    readonly_fields = ('course', 'type', 'score', 'date', 'is_final_grade')
+    fields = ('course', 'get_type', 'score', 'date', 'is_final_grade')
+    readonly_fields = ('course', 'get_type', 'score', 'date', 'is_final_grade')
     verbose_name = "Оценка"
     verbose_name_plural = "Оценки"
     can_delete = False
     
+    def get_type(self, obj):
+        return str(assessment_types.get(obj.type_id))
+    get_type.short_description = 'Тип зачета'
+    
     def has_add_permission(self, request, obj=None):
         return False
 
@@ -80,13 +422,18 @@ class EnrollmentInline(admin.TabularInline):
     """ Inline класс для записей о зачислении """
     model = Enrollment
     extra = 0
-    readonly_fields = ('session', 'status', 'enrolled_on')
+    fields = ('get_session', 'status', 'enrolled_on')
+    readonly_fields = ('get_session', 'status', 'enrolled_on')
     verbose_name = "Зачисление"
     verbose_name_plural = "Записи о зачислении"
     can_delete = False
     show_change_link = False
     max_num = 10  # Ограничиваем количество
     
+    def get_session(self, obj):
+        return session_label(obj)
+    get_session.short_description = 'Сессия'
+    
     def has_add_permission(self, request, obj=None):
         return False
 
@@ -94,6 +441,7 @@ class EnrollmentInline(admin.TabularInline):
 class SessionAdmin(OptimizedMixin, admin.ModelAdmin):
     """ Класс для отображения в админке модели Session """
     list_display = ("session_number", "get_courses_count", "get_students_count")
+    search_fields = ("session_number",)
     ordering = ("session_number",)
     list_per_page = 50
     
@@ -124,7 +472,8 @@ class StudentAdmin(OptimizedMixin, admin.ModelAdmin):
                     'get_certificates_count',
                     'get_total_score')
     search_fields = ('full_name', 'email')
-    list_filter = ('status',)
+    search_rank_fields = ('full_name',)
+    list_filter = ('status', SessionsCountFilter, CertificatesCountFilter, AvgScoreFilter)
     inlines = []  # Убираю inline для ускорения загрузки
     list_per_page = 20  # Еще меньше записей на странице
     readonly_fields = ('get_quick_stats',)
@@ -139,133 +488,124 @@ class StudentAdmin(OptimizedMixin, admin.ModelAdmin):
     )
     
     def optimize_queryset(self, qs):
-        """Минимальная оптимизация для списка студентов"""
-        return qs.select_related('statistic').annotate(
-            sessions_count=Count('enrollments__session', distinct=True),
-            certificates_count=Count('certificates', distinct=True)
-        )
+        # Счетчики студента - готовая строка StudentAggregate (см. core/aggregates.py)
+        return qs.select_related('statistic', 'aggregate')
+    
+    def student_aggregate(self, obj):
+        """Счетчики студента; пустые, если студент еще не пересчитан"""
+        try:
+            return obj.aggregate
+        except StudentAggregate.DoesNotExist:
+            return StudentAggregate(student=obj)
     
     def get_sessions_count(self, obj):
-        if hasattr(obj, 'sessions_count'):
-            return obj.sessions_count
-        return obj.enrollments.values('session').distinct().count()
+        return self.student_aggregate(obj).sessions_count
     get_sessions_count.short_description = 'Сессий'
+    get_sessions_count.admin_order_field = 'aggregate__sessions_count'
     
     def get_certificates_count(self, obj):
-        if hasattr(obj, 'certificates_count'):
-            return obj.certificates_count
-        return obj.certificates.count()
+        return self.student_aggregate(obj).certificates_count
     get_certificates_count.short_description = 'Сертификатов'
+    get_certificates_count.admin_order_field = 'aggregate__certificates_count'
     
     def get_total_score(self, obj):
-        """Быстрый подсчет среднего балла"""
-        cache_key = f"student_avg_score_{obj.id}"
-        avg_score = cache.get(cache_key)
-        
-        if avg_score is None:
-            # Самый быстрый запрос для среднего балла
-            scores = Assessment.objects.filter(
-                enrollment__student=obj, 
-                is_final_grade=True
-            ).values_list('score', flat=True)
-            
-            if scores:
-                avg_score = sum(float(score) for score in scores) / len(scores)
-                cache.set(cache_key, avg_score, 600)  # Кэш на 10 минут
-            else:
-                avg_score = 0
-        
+        avg_score = self.student_aggregate(obj).avg_score
         return f"{avg_score:.1f}" if avg_score > 0 else "—"
     get_total_score.short_description = 'Средний балл'
+    get_total_score.admin_order_field = 'aggregate__avg_score'
     
     def get_quick_stats(self, obj):
         """Быстрая статистика без детализации"""
-        cache_key = f"student_quick_stats_{obj.id}"
-        html_content = cache.get(cache_key)
-        
-        if html_content is None:
-            try:
-                stat = obj.statistic
-                html_content = format_html(
-                    """
-                    <div style="background: var(--body-bg, #f8f9fa); border: 1px solid var(--border-color, #dee2e6); padding: 12px; border-radius: 6px; font-size: 14px; color: var(--body-fg, #333);">
-                        <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(150px, 1fr)); gap: 10px;">
-                            <div>📚 Прослушано: <strong>{}</strong></div>
-                            <div>✅ Освидетельствовано: <strong style="color: #28a745;">{}</strong></div>
-                            <div>❌ Не освидетельствовано: <strong style="color: #dc3545;">{}</strong></div>
-                            <div>📅 Посещено сессий: <strong>{}</strong></div>
-                        </div>
-                        <div style="margin-top: 10px; padding-top: 10px; border-top: 1px solid var(--border-color, #dee2e6); color: var(--body-quiet-color, #6c757d); text-align: center;">
-                            <a href="/admin/core/enrollment/?q={}" target="_blank" style="margin-right: 10px; color: var(--link-fg, #0066cc);">📝 Зачисления</a>
-                            <a href="/admin/core/certificate/?q={}" target="_blank" style="margin-right: 10px; color: var(--link-fg, #0066cc);">🏆 Сертификаты</a>
-                            <a href="/admin/core/assessment/?q={}" target="_blank" style="color: var(--link-fg, #0066cc);">📊 Оценки</a>
-                        </div>
-                    </div>
-                    """,
-                    stat.total_courses,
-                    stat.certified,
-                    stat.uncertified,
-                    stat.sessions_attended,
-                    obj.full_name,
-                    obj.full_name,
-                    obj.full_name
-                )
-                cache.set(cache_key, html_content, 900)  # Кэш на 15 минут
-            except Statistic.DoesNotExist:
-                html_content = format_html(
-                    """
-                    <div style='color: #6c757d; text-align: center; padding: 20px;'>
-                        Статистика не рассчитана<br>
-                        <a href="/admin/core/enrollment/?q={}" target="_blank" style="margin-right: 10px;">📝 Зачисления</a>
-                        <a href="/admin/core/certificate/?q={}" target="_blank">🏆 Сертификаты</a>
-                    </div>
-                    """,
-                    obj.id,
-                    obj.full_name
-                )
-                cache.set(cache_key, html_content, 300)
-        
+        html_content = get_or_compute(
+            versioned_key("student_quick_stats_", STUDENT, obj.id),
+            lambda: self.render_quick_stats(obj),
+            AGGREGATE_TIMEOUT,
+        )
         return mark_safe(html_content)
     get_quick_stats.short_description = 'Статистика и ссылки'
 
+    def render_quick_stats(self, obj):
+        """HTML блока быстрой статистики"""
+        try:
+            stat = obj.statistic
+            html_content = format_html(
+                """
+                <div style="background: var(--body-bg, #f8f9fa); border: 1px solid var(--border-color, #dee2e6); padding: 12px; border-radius: 6px; font-size: 14px; color: var(--body-fg, #333);">
+                    <div style="display: grid; grid-template-columns: repeat(auto-fit, minmax(150px, 1fr)); gap: 10px;">
+                        <div>📚 Прослушано: <strong>{}</strong></div>
+                        <div>✅ Освидетельствовано: <strong style="color: #28a745;">{}</strong></div>
+                        <div>❌ Не освидетельствовано: <strong style="color: #dc3545;">{}</strong></div>
+                        <div>📅 Посещено сессий: <strong>{}</strong></div>
+                    </div>
+                    <div style="margin-top: 10px; padding-top: 10px; border-top: 1px solid var(--border-color, #dee2e6); color: var(--body-quiet-color, #6c757d); text-align: center;">
+                        <a href="/admin/core/enrollment/?q={}" target="_blank" style="margin-right: 10px; color: var(--link-fg, #0066cc);">📝 Зачисления</a>
+                        <a href="/admin/core/certificate/?q={}" target="_blank" style="margin-right: 10px; color: var(--link-fg, #0066cc);">🏆 Сертификаты</a>
+                        <a href="/admin/core/assessment/?q={}" target="_blank" style="color: var(--link-fg, #0066cc);">📊 Оценки</a>
+                    </div>
+                </div>
+                """,
+                stat.total_courses,
+                stat.certified,
+                stat.uncertified,
+                stat.sessions_attended,
+                obj.full_name,
+                obj.full_name,
+                obj.full_name
+            )
+        except Statistic.DoesNotExist:
+            html_content = format_html(
+                """
+                <div style='color: #6c757d; text-align: center; padding: 20px;'>
+                    Статистика не рассчитана<br>
+                    <a href="/admin/core/enrollment/?q={}" target="_blank" style="margin-right: 10px;">📝 Зачисления</a>
+                    <a href="/admin/core/certificate/?q={}" target="_blank">🏆 Сертификаты</a>
+                </div>
+                """,
+                obj.id,
+                obj.full_name
+            )
+        return html_content
+
 @admin.register(Course)
 class CourseAdmin(OptimizedMixin, admin.ModelAdmin):
     """ Класс для отображения в админке модели Course """
     list_display = ('title',
-                    'session',
+                    'get_session',
                     'get_students_count',
                     'get_avg_score',
                     'description',
                     )
-    list_filter = ('session',)
+    list_filter = (('session', ReferenceListFilter),)
     search_fields = ('title',)
     ordering = ('session__session_number', 'title')
     list_per_page = 50
     
     def optimize_queryset(self, qs):
-        return qs.select_related('session').prefetch_related('assessments__enrollment__student')
+        # Агрегаты предмета - готовая строка CourseAggregate (см. core/aggregates.py)
+        return qs.select_related('aggregate')
+    
+    def get_session(self, obj):
+        return session_label(obj)
+    get_session.short_description = 'Сессия'
+    get_session.admin_order_field = 'session__session_number'
+    
+    def course_aggregate(self, obj):
+        """Агрегаты предмета; пустые, если предмет еще не пересчитан"""
+        try:
+            return obj.aggregate
+        except CourseAggregate.DoesNotExist:
+            return CourseAggregate(course=obj)
     
     def get_students_count(self, obj):
-        cache_key = f"course_students_{obj.id}"
-        count = cache.get(cache_key)
-        if count is None:
-            count = obj.assessments.values('enrollment__student').distinct().count()
-            cache.set(cache_key, count, 300)
-        return count
+        return self.course_aggregate(obj).students_count
     get_students_count.short_description = 'Студентов'
+    get_students_count.admin_order_field = 'aggregate__students_count'
     
     def get_avg_score(self, obj):
-        cache_key = f"course_avg_{obj.id}"
-        avg = cache.get(cache_key)
-        if avg is None:
-            final_assessments = obj.assessments.filter(is_final_grade=True)
-            if final_assessments.exists():
-                avg = sum(float(a.score) for a in final_assessments) / final_assessments.count()
-                cache.set(cache_key, avg, 300)
-            else:
-                avg = 0
+        avg = self.course_aggregate(obj).avg_score
         return f"{avg:.1f}" if avg > 0 else "—"
     get_avg_score.short_description = 'Средний балл'
+    get_avg_score.admin_order_field = 'aggregate__avg_score'
 
 @admin.register(Enrollment)
 class EnrollmentAdmin(OptimizedMixin, admin.ModelAdmin):
@@ -276,20 +616,22 @@ class EnrollmentAdmin(OptimizedMixin, admin.ModelAdmin):
         'status',
         'enrolled_on',
         'get_attendance_status')
-    list_filter = ('status', 'session')
+    list_filter = ('status', ('session', ReferenceListFilter))
     search_fields = ('student__full_name',)
     date_hierarchy = "enrolled_on"
     list_per_page = 50
+    autocomplete_fields = ('student', 'session')
+    label_related = ('student',)
     
     def optimize_queryset(self, qs):
-        return qs.select_related('student', 'session').prefetch_related('attendances')
+        return qs.select_related('student').prefetch_related('attendances')
     
     def get_student_name(self, obj):
         return obj.student.full_name
     get_student_name.short_description = 'Студент'
     
     def get_session_number(self, obj):
-        return f"№{obj.session.session_number}"
+        return session_number_label(obj)
     get_session_number.short_description = 'Сессия'
     
     def get_attendance_status(self, obj):
@@ -307,35 +649,42 @@ class AttendanceAdmin(OptimizedMixin, admin.ModelAdmin):
         "get_session_number",
         "present",
     )
-    list_filter = ("present", "session")
+    list_filter = ("present", ("session", ReferenceListFilter))
     search_fields = ("enrollment__student__full_name",)
     list_per_page = 100
+    autocomplete_fields = ("enrollment", "session")
+    label_related = ("enrollment__student",)
+    # Большие таблицы: оценочное количество строк вместо COUNT(*) (см. core/pagination.py)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Листание вглубь - по курсору (индекс в порядке сортировки - в Meta модели)
+    keyset_pagination = True
     
     def optimize_queryset(self, qs):
-        return qs.select_related('enrollment__student', 'session')
+        return qs.select_related('enrollment__student')
     
     def get_student_name(self, obj):
         return obj.enrollment.student.full_name
     get_student_name.short_description = 'Студент'
     
     def get_session_number(self, obj):
-        return f"№{obj.session.session_number}"
+        return session_number_label(obj)
     get_session_number.short_description = 'Сессия'
 
 @admin.register(AssessmentType)
 class AssessmentTypeAdmin(OptimizedMixin, admin.ModelAdmin):
     """ Класс для отображения в админке модели AssessmentType """
     list_display = ("name", "weight", "get_assessments_count")
+    search_fields = ("name",)
     ordering = ("name",)
     list_per_page = 50
+    batch_columns = {
+        'assessments_count': {'prefix': 'assessment_type_count_', 'namespace': ASSESSMENT_TYPE,
+                              'one': assessment_type_count, 'many': assessment_type_counts},
+    }
     
     def get_assessments_count(self, obj):
-        cache_key = f"assessment_type_count_{obj.id}"
-        count = cache.get(cache_key)
-        if count is None:
-            count = obj.assessments.count()
-            cache.set(cache_key, count, 600)
-        return count
+        return self.column_value(obj, 'assessments_count')
     get_assessments_count.short_description = 'Оценок'
 
 @admin.register(Assessment)
@@ -344,22 +693,41 @@ class AssessmentAdmin(OptimizedMixin, admin.ModelAdmin):
     list_display = (
         "get_student_name",
         "course",
-        "type",
+        "get_type",
         "score",
         "date",
         "is_final_grade",
     )
-    list_filter = ("course", "type", "date", "is_final_grade", "enrollment__student")
+    list_filter = (
+        ("course", AutocompleteListFilter),
+        ("type", ReferenceListFilter),
+        "date",
+        "is_final_grade",
+        ("enrollment__student", AutocompleteListFilter),
+    )
     search_fields = ("enrollment__student__full_name", "course__title")
+    search_rank_fields = ("enrollment__student__full_name",)
     date_hierarchy = "date"
     list_per_page = 100
+    autocomplete_fields = ("enrollment", "course", "type")
+    label_related = ("enrollment__student", "course")
+    # Большие таблицы: оценочное количество строк вместо COUNT(*) (см. core/pagination.py)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Листание вглубь - по курсору (индекс в порядке сортировки - в Meta модели)
+    keyset_pagination = True
     
     def optimize_queryset(self, qs):
-        return qs.select_related('enrollment__student', 'course', 'type')
+        return qs.select_related('enrollment__student', 'course')
     
     def get_student_name(self, obj):
         return obj.enrollment.student.full_name
     get_student_name.short_description = 'Студент'
+    
+    def get_type(self, obj):
+        return str(assessment_types.get(obj.type_id))
+    get_type.short_description = 'Тип зачета'
+    get_type.admin_order_field = 'type__name'
 
 @admin.register(Certificate)
 class CertificateAdmin(OptimizedMixin, admin.ModelAdmin):
@@ -371,13 +739,19 @@ class CertificateAdmin(OptimizedMixin, admin.ModelAdmin):
         "issued_on",
         "get_assessment_score"
     )
-    list_filter = ("type", "course__session", "issued_on")
+    list_filter = ("type", ("course__session", ReferenceListFilter), "issued_on")
     search_fields = ("student__full_name", "course__title")
+    search_rank_fields = ("student__full_name",)
     date_hierarchy = "issued_on"
     list_per_page = 100
+    autocomplete_fields = ("student", "course", "assessment")
+    label_related = ("student", "course")
+    # Большие таблицы: оценочное количество строк вместо COUNT(*) (см. core/pagination.py)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     def optimize_queryset(self, qs):
-        return qs.select_related('student', 'course__session', 'assessment__type')
+        return qs.select_related('student', 'course', 'assessment')
     
     def get_assessment_score(self, obj):
         if obj.assessment:
@@ -0,0 +1,200 @@
+"""
+Агрегаты, которые админка показывает в списках.
+
+Агрегаты типов зачетов кэшируются: одни и те же вычисления используются
+в core/admin.py и при прогреве кэша в init_production. Агрегаты предметов
+и студентов хранятся в таблицах CourseAggregate и StudentAggregate и
+пересчитываются после фиксации изменений зачислений, оценок и сертификатов.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from core.models import Assessment, Certificate, Course, CourseAggregate, Enrollment, Student, StudentAggregate
+
+_local = threading.local()
+
+
+def assessment_type_count(type_id):
+    """Количество оценок данного типа"""
+    return Assessment.objects.filter(type_id=type_id).count()
+
+
+# Групповые варианты: одно значение на каждый объект за один запрос
+# (ids - только для этих объектов, None - для всех). Объекты без оценок
+# в результат не попадают - для них значение 0.
+
+def _only(qs, field, ids):
+    return qs if ids is None else qs.filter(**{f'{field}__in': ids})
+
+
+def course_students_counts(ids=None):
+    """Количество студентов с оценками по предметам: {course_id: количество}"""
+    return dict(
+        _only(Assessment.objects.all(), 'course_id', ids).values('course_id')
+        .annotate(students=Count('enrollment__student', distinct=True))
+        .values_list('course_id', 'students')
+    )
+
+
+def assessment_type_counts(ids=None):
+    """Количество оценок по типам: {type_id: количество}"""
+    return dict(
+        _only(Assessment.objects.all(), 'type_id', ids).values('type_id')
+        .annotate(total=Count('id'))
+        .values_list('type_id', 'total')
+    )
+
+
+# Агрегаты предметов (CourseAggregate)
+
+CERTIFICATE_FIELDS = {status: f'certificates_{status}' for status in Certificate.Status.values}
+
+COURSE_FIELDS = ['final_count', 'final_sum', 'avg_score', 'students_count', *CERTIFICATE_FIELDS.values(), 'updated_at']
+
+
+def refresh_course_aggregates(course_ids=None, batch_size=1000):
+    """
+    Пересчитывает CourseAggregate групповыми запросами и записывает upsert.
+    course_ids=None - все предметы (полная перестройка). Возвращает
+    количество записанных строк.
+    """
+    if course_ids is None:
+        ids = list(Course.objects.values_list('id', flat=True))
+        scope = None
+    else:
+        ids = scope = list(set(course_ids))
+    if not ids:
+        return 0
+
+    finals = {
+        row['course_id']: row
+        for row in _only(Assessment.objects.filter(is_final_grade=True), 'course_id', scope)
+        .values('course_id')
+        .annotate(count=Count('id'), total=Sum('score'))
+    }
+    students = course_students_counts(scope)
+    certificates = {}
+    by_status = _only(Certificate.objects.all(), 'course_id', scope).values('course_id', 'type')
+    for row in by_status.annotate(total=Count('id')):
+        certificates.setdefault(row['course_id'], {})[row['type']] = row['total']
+
+    rows = []
+    for course_id in ids:
+        final = finals.get(course_id, {'count': 0, 'total': 0})
+        total = final['total'] or 0
+        aggregate = CourseAggregate(
+            course_id=course_id,
+            final_count=final['count'],
+            final_sum=total,
+            avg_score=float(total) / final['count'] if final['count'] else 0,
+            students_count=students.get(course_id, 0),
+        )
+        for status, field in CERTIFICATE_FIELDS.items():
+            setattr(aggregate, field, certificates.get(course_id, {}).get(status, 0))
+        rows.append(aggregate)
+
+    # Предмет мог быть удален параллельно - upsert только для существующих
+    if course_ids is not None:
+        existing = set(Course.objects.filter(id__in=ids).values_list('id', flat=True))
+        rows = [row for row in rows if row.course_id in existing]
+    CourseAggregate.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=COURSE_FIELDS,
+    )
+    return len(rows)
+
+
+# Агрегаты студентов (StudentAggregate)
+
+STUDENT_FIELDS = ['sessions_count', 'certificates_count', 'final_count', 'final_sum', 'avg_score', 'updated_at']
+
+
+def refresh_student_aggregates(student_ids=None, batch_size=1000):
+    """
+    Пересчитывает StudentAggregate групповыми запросами и записывает upsert.
+    student_ids=None - все студенты. Возвращает количество записанных строк.
+    """
+    if student_ids is None:
+        ids = list(Student.objects.values_list('id', flat=True))
+        scope = None
+    else:
+        ids = scope = list(set(student_ids))
+    if not ids:
+        return 0
+
+    finals = {
+        row['enrollment__student_id']: row
+        for row in _only(Assessment.objects.filter(is_final_grade=True), 'enrollment__student_id', scope)
+        .values('enrollment__student_id')
+        .annotate(count=Count('id'), total=Sum('score'))
+    }
+    sessions = dict(
+        _only(Enrollment.objects.all(), 'student_id', scope).values('student_id')
+        .annotate(total=Count('session', distinct=True))
+        .values_list('student_id', 'total')
+    )
+    certificates = dict(
+        _only(Certificate.objects.all(), 'student_id', scope).values('student_id')
+        .annotate(total=Count('id'))
+        .values_list('student_id', 'total')
+    )
+
+    rows = []
+    for student_id in ids:
+        final = finals.get(student_id, {'count': 0, 'total': 0})
+        total = final['total'] or 0
+        rows.append(StudentAggregate(
+            student_id=student_id,
+            sessions_count=sessions.get(student_id, 0),
+            certificates_count=certificates.get(student_id, 0),
+            final_count=final['count'],
+            final_sum=total,
+            avg_score=float(total) / final['count'] if final['count'] else 0,
+        ))
+
+    if student_ids is not None:
+        existing = set(Student.objects.filter(id__in=ids).values_list('id', flat=True))
+        rows = [row for row in rows if row.student_id in existing]
+    StudentAggregate.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['student'],
+        update_fields=STUDENT_FIELDS,
+    )
+    return len(rows)
+
+
+def refresh_on_commit(courses=(), students=(), enrollments=()):
+    """
+    Откладывает пересчет агрегатов до фиксации транзакции; объекты из
+    нескольких вызовов в одной транзакции пересчитываются вместе.
+    enrollments - студенты этих зачислений (оценка знает только зачисление).
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = {'courses': set(), 'students': set(), 'enrollments': set()}
+    for name, pks in (('courses', courses), ('students', students), ('enrollments', enrollments)):
+        pending[name].update(pk for pk in pks if pk is not None)
+    transaction.on_commit(_flush)
+
+
+def _flush():
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    if not pending:
+        return
+    if pending['courses']:
+        refresh_course_aggregates(pending['courses'])
+    students = pending['students']
+    if pending['enrollments']:
+        students |= set(
+            Enrollment.objects.filter(id__in=pending['enrollments']).values_list('student_id', flat=True)
+        )
+    if students:
+        refresh_student_aggregates(students)
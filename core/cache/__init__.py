@@ -0,0 +1 @@
+"""Кэш-бэкенды и вспомогательные функции кэширования проекта."""
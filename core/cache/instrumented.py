@@ -0,0 +1,262 @@
+"""
+Кэш-обертка со счетчиками по префиксам ключей.
+
+InstrumentedCache передает все операции другому алиасу кэша и считает
+для каждого префикса ключа (student_quick_stats_, assessment_type_count_, ...):
+попадания и промахи (get, get_many, has_key), записи (set, add, touch,
+incr), удаления, время чтения, записи и удаления и размер записанных
+значений (pickle). Префикс - часть ключа до первой цифры. clear не
+относится ни к одному префиксу и не учитывается.
+Размер измеряется выборочно - у доли SIZE_SAMPLE_RATE записей с
+пересчетом на все, чтобы не сериализовать каждое значение лишний раз.
+
+Счетчики копятся в памяти процесса и не чаще раза в FLUSH_INTERVAL секунд
+записываются одним upsert в таблицу CacheMetric - по строке на воркер и
+префикс. Внутри транзакции вызывающего кода сброс откладывается до
+первой операции кэша вне транзакции, а любая ошибка записи возвращает
+счетчики в очередь: учет не должен ломать чтение и запись кэша. Сумма
+строк дает итог по всем воркерам gunicorn (команда cache_stats). Данные за последние FLUSH_INTERVAL секунд работы воркера
+могут не попасть в таблицу.
+
+Настройка:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.instrumented.InstrumentedCache',
+            'OPTIONS': {'CACHE': 'tiered', 'FLUSH_INTERVAL': 30},
+        },
+        'tiered': {...},
+    }
+
+Остальные атрибуты (l2, tier_stats) берутся у обернутого кэша.
+"""
+import os
+import pickle
+import random
+import re
+import socket
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+from django.utils import timezone
+
+PREFIX_RE = re.compile(r'[^0-9]*')
+
+# Ключ без префикса (начинается с цифры)
+OTHER_PREFIX = '<без префикса>'
+
+MISSING = object()
+
+# Доля записей, у которых измеряется размер значения
+SIZE_SAMPLE_RATE = 0.05
+
+# Счетчики процесса по обернутым алиасам (экземпляры бэкенда создаются на каждый запрос)
+_processes = {}
+_processes_lock = threading.Lock()
+
+
+def key_prefix(key):
+    """Префикс ключа: часть до первой цифры"""
+    return PREFIX_RE.match(str(key)).group()[:100] or OTHER_PREFIX
+
+
+def empty_metric():
+    return {
+        'hits': 0, 'misses': 0, 'sets': 0, 'deletes': 0,
+        'get_seconds': 0.0, 'set_seconds': 0.0, 'delete_seconds': 0.0, 'set_bytes': 0,
+    }
+
+
+class ProcessMetrics:
+    """Накопленные счетчики процесса: {префикс: счетчики}"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.dirty = set()
+        self.flushed_at = time.monotonic()
+        self.pid = os.getpid()
+        self.worker = f"{socket.gethostname()}:{self.pid}:{int(time.time())}"[:100]
+
+
+def process_metrics(alias):
+    with _processes_lock:
+        metrics = _processes.get(alias)
+        # После fork (gunicorn --preload) у воркера свой pid - и свои счетчики
+        if metrics is None or metrics.pid != os.getpid():
+            metrics = _processes[alias] = ProcessMetrics()
+        return metrics
+
+
+class InstrumentedCache(BaseCache):
+    """Обертка над алиасом кэша со счетчиками по префиксам ключей"""
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.wrapped_alias = options.pop('CACHE', location or 'tiered')
+        self.flush_interval = float(options.pop('FLUSH_INTERVAL', 30))
+        super().__init__({**params, 'OPTIONS': options})
+
+    @property
+    def wrapped(self):
+        return caches[self.wrapped_alias]
+
+    def __getattr__(self, name):
+        # Вызывается только для отсутствующих атрибутов: l2, tier_stats и т.п.
+        if name.startswith('__') or name == 'wrapped_alias':
+            raise AttributeError(name)
+        return getattr(self.wrapped, name)
+
+    # Учет
+
+    def _record(self, counts):
+        """Добавляет счетчики {префикс: {метрика: значение}} и при необходимости сбрасывает их в БД"""
+        metrics = process_metrics(self.wrapped_alias)
+        with metrics.lock:
+            for prefix, values in counts.items():
+                total = metrics.totals.setdefault(prefix, empty_metric())
+                for name, value in values.items():
+                    total[name] += value
+                metrics.dirty.add(prefix)
+            # Внутри чужой транзакции не пишем: ждем операцию вне нее
+            due = (
+                time.monotonic() - metrics.flushed_at >= self.flush_interval
+                and not transaction.get_connection().in_atomic_block
+            )
+            if due:
+                metrics.flushed_at = time.monotonic()
+        if due:
+            self.flush(metrics)
+
+    def _record_keys(self, keys, seconds, counter, time_counter):
+        """+1 к counter для каждого ключа; время операции делится поровну"""
+        counts = {}
+        share = seconds / len(keys) if keys else 0.0
+        for key in keys:
+            entry = counts.setdefault(key_prefix(key), {counter: 0, time_counter: 0.0})
+            entry[counter] += 1
+            entry[time_counter] += share
+        self._record(counts)
+
+    def _record_sets(self, data, seconds):
+        share = seconds / len(data) if data else 0.0
+        counts = {}
+        for key, value in data.items():
+            entry = counts.setdefault(key_prefix(key), {'sets': 0, 'set_seconds': 0.0, 'set_bytes': 0})
+            entry['sets'] += 1
+            entry['set_seconds'] += share
+            if random.random() < SIZE_SAMPLE_RATE:
+                # Оценка объема всех записей: измеренный размер с весом 1 / SIZE_SAMPLE_RATE
+                entry['set_bytes'] += round(len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)) / SIZE_SAMPLE_RATE)
+        self._record(counts)
+
+    def flush(self, metrics=None):
+        """Записывает накопленные счетчики процесса в CacheMetric одним upsert"""
+        from core.models import CacheMetric
+
+        metrics = metrics or process_metrics(self.wrapped_alias)
+        with metrics.lock:
+            dirty = [(prefix, dict(metrics.totals[prefix])) for prefix in metrics.dirty]
+            metrics.dirty = set()
+        if not dirty:
+            return
+        now = timezone.now()
+        rows = [CacheMetric(worker=metrics.worker, prefix=prefix, updated_at=now, **totals) for prefix, totals in dirty]
+        try:
+            # Отдельная точка сохранения: ошибка не ломает транзакцию запроса
+            with transaction.atomic():
+                CacheMetric.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=['worker', 'prefix'],
+                    update_fields=list(empty_metric()) + ['updated_at'],
+                )
+        except Exception:
+            # Таблицы еще нет, транзакция вызывающего кода уже сломана и т.п.:
+            # попробуем при следующем сбросе
+            with metrics.lock:
+                metrics.dirty.update(prefix for prefix, totals in dirty)
+
+    # API кэша Django
+
+    def get(self, key, default=None, version=None):
+        started = time.perf_counter()
+        value = self.wrapped.get(key, MISSING, version=version)
+        seconds = time.perf_counter() - started
+        if value is MISSING:
+            self._record_keys([key], seconds, 'misses', 'get_seconds')
+            return default
+        self._record_keys([key], seconds, 'hits', 'get_seconds')
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        started = time.perf_counter()
+        found = self.wrapped.get_many(keys, version=version)
+        seconds = time.perf_counter() - started
+        share = seconds / len(keys) if keys else 0.0
+        counts = {}
+        for key in keys:
+            entry = counts.setdefault(key_prefix(key), {'hits': 0, 'misses': 0, 'get_seconds': 0.0})
+            entry['hits' if key in found else 'misses'] += 1
+            entry['get_seconds'] += share
+        self._record(counts)
+        return found
+
+    def has_key(self, key, version=None):
+        started = time.perf_counter()
+        found = self.wrapped.has_key(key, version=version)
+        self._record_keys([key], time.perf_counter() - started, 'hits' if found else 'misses', 'get_seconds')
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        started = time.perf_counter()
+        self.wrapped.set(key, value, timeout, version=version)
+        self._record_sets({key: value}, time.perf_counter() - started)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        started = time.perf_counter()
+        failed = self.wrapped.set_many(data, timeout, version=version)
+        self._record_sets(data, time.perf_counter() - started)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        started = time.perf_counter()
+        added = self.wrapped.add(key, value, timeout, version=version)
+        if added:
+            self._record_sets({key: value}, time.perf_counter() - started)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        started = time.perf_counter()
+        touched = self.wrapped.touch(key, timeout, version=version)
+        if touched:
+            self._record_keys([key], time.perf_counter() - started, 'sets', 'set_seconds')
+        return touched
+
+    def delete(self, key, version=None):
+        started = time.perf_counter()
+        deleted = self.wrapped.delete(key, version=version)
+        self._record_keys([key], time.perf_counter() - started, 'deletes', 'delete_seconds')
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        started = time.perf_counter()
+        self.wrapped.delete_many(keys, version=version)
+        self._record_keys(keys, time.perf_counter() - started, 'deletes', 'delete_seconds')
+
+    def incr(self, key, delta=1, version=None):
+        started = time.perf_counter()
+        value = self.wrapped.incr(key, delta, version=version)
+        self._record_sets({key: value}, time.perf_counter() - started)
+        return value
+
+    def clear(self):
+        self.wrapped.clear()
+
+    def close(self, **kwargs):
+        self.wrapped.close(**kwargs)
@@ -0,0 +1,124 @@
+"""
+Версионированные пространства имен для кэша агрегатов админки.
+
+Ключ агрегата содержит версию пространства имен объекта (студента,
+предмета, типа зачета): student_quick_stats_15:v1718000000000000000.
+Инвалидация удаляет ключ версии; при следующем чтении создается новая
+версия, и все агрегаты объекта читаются по новым ключам. Старые значения
+никто больше не запрашивает, они вытесняются кэшем по TTL. Поэтому TTL
+агрегатов может быть длинным.
+
+Изменения моделей отслеживаются сигналами (core/signals.py), массовая
+запись импорта вызывает invalidate_on_commit явно. Инвалидация
+выполняется после фиксации транзакции, чтобы параллельный запрос не
+закэшировал данные, которые еще не видны.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Пространства имен
+STUDENT = 'student'
+COURSE = 'course'
+ASSESSMENT_TYPE = 'assessment_type'
+
+# TTL агрегатов: устаревание исключено версиями, TTL лишь освобождает место
+AGGREGATE_TIMEOUT = 6 * 60 * 60  # 6 часов
+
+_local = threading.local()
+
+
+def version_key(namespace, pk):
+    return f"ns_version:{namespace}:{pk}"
+
+
+def get_versions(namespace, pks, bulk=False):
+    """
+    Версии пространств имен {pk: версия}; недостающие создаются одним проходом.
+
+    bulk=True записывает недостающие версии одним set_many (для прогрева):
+    перезапись версии, созданной параллельно, дает лишь лишний промах
+    кэша, но не устаревшее значение.
+    """
+    keys = {pk: version_key(namespace, pk) for pk in pks}
+    found = cache.get_many(list(keys.values()))
+    versions = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [pk for pk in keys if pk not in versions]
+    if missing and bulk:
+        new_version = time.time_ns()
+        cache.set_many({keys[pk]: new_version for pk in missing}, None)
+        versions.update((pk, new_version) for pk in missing)
+    elif missing:
+        # add не перезапишет версию, созданную параллельно другим воркером
+        new_version = time.time_ns()
+        for pk in missing:
+            cache.add(keys[pk], new_version, None)
+        found = cache.get_many([keys[pk] for pk in missing])
+        for pk in missing:
+            versions[pk] = found.get(keys[pk], new_version)
+    return versions
+
+
+def versioned_key(prefix, namespace, pk):
+    """Ключ агрегата объекта с текущей версией пространства имен"""
+    return versioned_keys(prefix, namespace, [pk])[pk]
+
+
+def versioned_keys(prefix, namespace, pks, bulk=False):
+    """Ключи агрегатов нескольких объектов: {pk: ключ}"""
+    return keys_for(prefix, get_versions(namespace, pks, bulk))
+
+
+def keys_for(prefix, versions):
+    """Ключи агрегатов по уже полученным версиям {pk: версия}"""
+    return {pk: f"{prefix}{pk}:v{version}" for pk, version in versions.items()}
+
+
+def invalidate(namespace, pks):
+    """Сбрасывает версии пространств имен: агрегаты объектов пересчитаются"""
+    keys = [version_key(namespace, pk) for pk in pks]
+    if keys:
+        cache.delete_many(keys)
+
+
+def invalidate_on_commit(students=(), courses=(), assessment_types=(), enrollments=(), sessions=()):
+    """
+    Откладывает инвалидацию до фиксации транзакции. Вызовы внутри одной
+    транзакции накапливаются и сбрасываются одним проходом. enrollments и
+    sessions разрешаются в студентов и предметы при сбросе.
+    """
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = {
+            STUDENT: set(), COURSE: set(), ASSESSMENT_TYPE: set(), 'enrollments': set(), 'sessions': set(),
+        }
+    for name, pks in ((STUDENT, students), (COURSE, courses), (ASSESSMENT_TYPE, assessment_types),
+                      ('enrollments', enrollments), ('sessions', sessions)):
+        pending[name].update(pk for pk in pks if pk is not None)
+    transaction.on_commit(flush)
+
+
+def flush():
+    """Выполняет накопленную инвалидацию (повторный вызов без новых данных ничего не делает)"""
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    if not pending:
+        return
+
+    from core.models import Course, Enrollment
+
+    students = pending[STUDENT]
+    courses = pending[COURSE]
+    if pending['enrollments']:
+        students.update(
+            Enrollment.objects.filter(pk__in=pending['enrollments']).values_list('student_id', flat=True)
+        )
+    if pending['sessions']:
+        courses.update(
+            Course.objects.filter(session_id__in=pending['sessions']).values_list('id', flat=True)
+        )
+    invalidate(STUDENT, students)
+    invalidate(COURSE, courses)
+    invalidate(ASSESSMENT_TYPE, pending[ASSESSMENT_TYPE])
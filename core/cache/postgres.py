@@ -0,0 +1,302 @@
+"""
+Кэш-бэкенд на UNLOGGED таблице PostgreSQL вместо DatabaseCache.
+
+Отличия от django.core.cache.backends.db.DatabaseCache:
+
+- таблица UNLOGGED: записи кэша не идут в WAL и не реплицируются (после
+  аварийного перезапуска PostgreSQL таблица очищается - для кэша это
+  допустимо);
+- get_many - один SELECT по ANY(ключи), set_many - один INSERT из unnest
+  с ON CONFLICT DO UPDATE, add - тот же upsert с условием на истекший
+  срок (атомарен, подходит для блокировок);
+- запись не считает COUNT(*) и не чистит таблицу: истекшие записи
+  удаляются пачками в фоновом потоке не чаще раза в CULL_INTERVAL секунд,
+  одновременно чистит только один воркер (advisory lock);
+- значения больше COMPRESS_MIN_LENGTH байт сжимаются zlib (HTML блоков
+  статистики админки), значения хранятся в bytea без base64.
+
+Настройка:
+
+    CACHES = {
+        'shared': {
+            'BACKEND': 'core.cache.postgres.PostgresCache',
+            'LOCATION': 'cache_entries',
+            'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_INTERVAL': 60, 'CULL_BATCH_SIZE': 1000,
+                        'COMPRESS_MIN_LENGTH': 1024},
+        },
+    }
+
+Таблица создается командой create_cache_table.
+"""
+import pickle
+import threading
+import time
+import zlib
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import Options
+from django.db import DatabaseError, connections, router, transaction
+
+# Первый байт значения: формат хранения
+RAW = b'p'
+COMPRESSED = b'z'
+
+# Время последней чистки по таблицам: {таблица: time.monotonic()}. На
+# уровне процесса - экземпляры бэкенда создаются на каждый запрос (gevent)
+_culls = {}
+_culls_lock = threading.Lock()
+
+
+class PostgresCache(BaseCache):
+    """Кэш в UNLOGGED таблице PostgreSQL"""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, table, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.cull_interval = float(options.pop('CULL_INTERVAL', 60))
+        self.cull_batch_size = int(options.pop('CULL_BATCH_SIZE', 1000))
+        self.compress_min_length = int(options.pop('COMPRESS_MIN_LENGTH', 1024))
+        self.compress_level = int(options.pop('COMPRESS_LEVEL', 6))
+        super().__init__({**params, 'OPTIONS': options})
+        self._table = table
+
+        class CacheEntry:
+            _meta = Options(table)
+
+        # Для роутеров БД, как у DatabaseCache
+        self.cache_model_class = CacheEntry
+
+    # Соединение и сериализация
+
+    def _connection(self, write=False):
+        if write:
+            db = router.db_for_write(self.cache_model_class)
+        else:
+            db = router.db_for_read(self.cache_model_class)
+        return db, connections[db]
+
+    def _quoted_table(self, connection):
+        return connection.ops.quote_name(self._table)
+
+    def _encode(self, value):
+        data = pickle.dumps(value, self.pickle_protocol)
+        if len(data) >= self.compress_min_length:
+            compressed = zlib.compress(data, self.compress_level)
+            if len(compressed) < len(data):
+                return COMPRESSED + compressed
+        return RAW + data
+
+    @staticmethod
+    def _decode(stored):
+        stored = bytes(stored)
+        data = stored[1:]
+        if stored[:1] == COMPRESSED:
+            data = zlib.decompress(data)
+        return pickle.loads(data)
+
+    def _expires(self, timeout):
+        # None (бессрочно) хранится как Infinity
+        expires = self.get_backend_timeout(timeout)
+        return float('inf') if expires is None else expires
+
+    # Чтение
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        db, connection = self._connection()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT cache_key, value FROM {self._quoted_table(connection)} "
+                f"WHERE cache_key = ANY(%s) AND expires > %s",
+                [list(key_map), time.time()],
+            )
+            rows = cursor.fetchall()
+        return {key_map[key]: self._decode(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT 1 FROM {self._quoted_table(connection)} WHERE cache_key = %s AND expires > %s",
+                [key, time.time()],
+            )
+            return cursor.fetchone() is not None
+
+    # Запись
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        if not data:
+            return []
+        keys = [self.make_and_validate_key(key, version=version) for key in data]
+        values = [self._encode(value) for value in data.values()]
+        expires = self._expires(timeout)
+        db, connection = self._connection(write=True)
+        table = self._quoted_table(connection)
+        try:
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} (cache_key, value, expires) "
+                    f"SELECT key, value, %s FROM unnest(%s::text[], %s::bytea[]) AS entry (key, value) "
+                    f"ON CONFLICT (cache_key) DO UPDATE SET value = EXCLUDED.value, expires = EXCLUDED.expires",
+                    [expires, keys, values],
+                )
+        except DatabaseError:
+            # Как и DatabaseCache: ошибка записи кэша не ломает запрос
+            return list(data)
+        self._schedule_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection(write=True)
+        table = self._quoted_table(connection)
+        try:
+            with transaction.atomic(using=db), connection.cursor() as cursor:
+                # Существующая запись перезаписывается, только если она истекла
+                cursor.execute(
+                    f"INSERT INTO {table} AS entry (cache_key, value, expires) VALUES (%s, %s, %s) "
+                    f"ON CONFLICT (cache_key) DO UPDATE SET value = EXCLUDED.value, expires = EXCLUDED.expires "
+                    f"WHERE entry.expires <= %s RETURNING cache_key",
+                    [key, self._encode(value), self._expires(timeout), time.time()],
+                )
+                added = cursor.fetchone() is not None
+        except DatabaseError:
+            return False
+        self._schedule_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection(write=True)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {self._quoted_table(connection)} SET expires = %s WHERE cache_key = %s AND expires > %s",
+                [self._expires(timeout), key, time.time()],
+            )
+            return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        db, connection = self._connection(write=True)
+        table = self._quoted_table(connection)
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT value FROM {table} WHERE cache_key = %s AND expires > %s FOR UPDATE",
+                [key, time.time()],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found.")
+            value = self._decode(row[0]) + delta
+            cursor.execute(f"UPDATE {table} SET value = %s WHERE cache_key = %s", [self._encode(value), key])
+        return value
+
+    def delete(self, key, version=None):
+        return self._delete_many([self.make_and_validate_key(key, version=version)])
+
+    def delete_many(self, keys, version=None):
+        self._delete_many([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def _delete_many(self, keys):
+        if not keys:
+            return False
+        db, connection = self._connection(write=True)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self._quoted_table(connection)} WHERE cache_key = ANY(%s)", [keys])
+            return bool(cursor.rowcount)
+
+    def clear(self):
+        db, connection = self._connection(write=True)
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self._quoted_table(connection)}")
+
+    # Чистка
+
+    def _schedule_cull(self):
+        """Запускает фоновую чистку, если с прошлой прошло CULL_INTERVAL секунд"""
+        now = time.monotonic()
+        with _culls_lock:
+            if now - _culls.get(self._table, 0.0) < self.cull_interval:
+                return
+            _culls[self._table] = now
+        threading.Thread(target=self._cull_in_background, daemon=True).start()
+
+    def _cull_in_background(self):
+        db, connection = self._connection(write=True)
+        try:
+            self.cull()
+        except DatabaseError:
+            pass  # чистка повторится при следующей записи
+        finally:
+            # У потока свое соединение с БД
+            connection.close()
+
+    def cull(self):
+        """
+        Удаляет истекшие записи пачками по CULL_BATCH_SIZE, затем, если
+        записей больше MAX_ENTRIES, - ближайшие к истечению. Каждая пачка -
+        отдельная короткая транзакция. Возвращает количество удаленных записей.
+        """
+        db, connection = self._connection(write=True)
+        table = self._quoted_table(connection)
+        deleted = 0
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [self._table])
+            if not cursor.fetchone()[0]:
+                return 0  # чистит другой воркер
+            try:
+                while True:
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE cache_key IN "
+                        f"(SELECT cache_key FROM {table} WHERE expires <= %s LIMIT %s)",
+                        [time.time(), self.cull_batch_size],
+                    )
+                    deleted += cursor.rowcount
+                    if cursor.rowcount < self.cull_batch_size:
+                        break
+
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                excess = cursor.fetchone()[0] - self._max_entries
+                while excess > 0:
+                    cursor.execute(
+                        f"DELETE FROM {table} WHERE cache_key IN "
+                        f"(SELECT cache_key FROM {table} ORDER BY expires LIMIT %s)",
+                        [min(excess, self.cull_batch_size)],
+                    )
+                    if not cursor.rowcount:
+                        break
+                    deleted += cursor.rowcount
+                    excess -= cursor.rowcount
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [self._table])
+        return deleted
+
+    # Таблица
+
+    def create_table(self, drop=False):
+        """Создает UNLOGGED таблицу кэша и индекс по сроку (drop - пересоздать)"""
+        db, connection = self._connection(write=True)
+        if connection.vendor != 'postgresql':
+            raise DatabaseError("PostgresCache работает только с PostgreSQL")
+        table = self._quoted_table(connection)
+        index = connection.ops.quote_name(f"{self._table}_expires")
+        with transaction.atomic(using=db), connection.cursor() as cursor:
+            if drop:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(
+                f"CREATE UNLOGGED TABLE IF NOT EXISTS {table} ("
+                f"cache_key varchar(255) PRIMARY KEY, "
+                f"value bytea NOT NULL, "
+                f"expires double precision NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (expires)")
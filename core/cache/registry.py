@@ -0,0 +1,126 @@
+"""
+Справочники в памяти процесса: сессии и типы зачетов.
+
+Таблицы маленькие, а читаются постоянно: __str__ предметов, зачислений и
+оценок, колонки и фильтры админки, импорт. Реестр загружает таблицу
+целиком один раз на воркер и отдает объекты из памяти.
+
+Согласованность - как у двухуровневого кэша: версия справочника лежит в
+общем кэше, воркер сверяет ее не чаще раза в SYNC_INTERVAL секунд и при
+расхождении перечитывает таблицу. Изменения отслеживаются сигналами
+(core/signals.py), массовая запись импорта сбрасывает версию явно; сброс
+выполняется после фиксации транзакции.
+
+Объекты реестра общие для всех запросов процесса - их нельзя изменять.
+"""
+import threading
+import time
+import uuid
+
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# Как часто воркер сверяет версию справочника (секунды)
+SYNC_INTERVAL = 1
+
+# Снимки по справочникам: {метка модели: Snapshot}. На уровне процесса -
+# экземпляры кэша и запросы под gevent живут в разных гринлетах
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+class Snapshot:
+    """Загруженное содержимое справочника"""
+
+    def __init__(self, version, objects, key_field):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.objects = objects
+        self.by_pk = {obj.pk: obj for obj in objects}
+        self.by_key = {}
+        # При повторе ключа - объект с меньшим id, как и при импорте
+        for obj in sorted(objects, key=lambda obj: obj.pk):
+            self.by_key.setdefault(getattr(obj, key_field), obj)
+
+
+class ReferenceRegistry:
+    """Справочник модели в памяти процесса с инвалидацией по версии"""
+
+    def __init__(self, model_label, key_field):
+        self.model_label = model_label
+        self.key_field = key_field
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    @property
+    def version_key(self):
+        return f"registry_version:{self.model_label}"
+
+    @staticmethod
+    def shared_cache():
+        # Версия читается из общего кэша в обход L1 двухуровневого кэша
+        return getattr(cache, 'l2', cache)
+
+    def snapshot(self, fresh=False):
+        """
+        Актуальный снимок справочника (перечитывается при смене версии).
+        fresh=True сверяет версию сразу, не дожидаясь SYNC_INTERVAL.
+        """
+        snapshot = _snapshots.get(self.model_label)
+        if snapshot is not None and not fresh and time.monotonic() - snapshot.checked_at < SYNC_INTERVAL:
+            return snapshot
+
+        shared = self.shared_cache()
+        version = shared.get(self.version_key)
+        if version is None:
+            shared.add(self.version_key, uuid.uuid4().hex, None)
+            version = shared.get(self.version_key)
+        if snapshot is not None and snapshot.version == version:
+            snapshot.checked_at = time.monotonic()
+            return snapshot
+
+        snapshot = Snapshot(version, list(self.model.objects.all()), self.key_field)
+        # Внутри транзакции могут быть видны незафиксированные строки - такой
+        # снимок используется только для текущего вызова
+        if not connection.in_atomic_block:
+            with _snapshots_lock:
+                _snapshots[self.model_label] = snapshot
+        return snapshot
+
+    def all(self):
+        """Все объекты в порядке Meta.ordering модели"""
+        return self.snapshot().objects
+
+    def get(self, pk):
+        """Объект по первичному ключу; если его еще нет в снимке - из БД"""
+        obj = self.snapshot().by_pk.get(pk)
+        if obj is None:
+            obj = self.model.objects.get(pk=pk)
+        return obj
+
+    def by_key(self, value, default=None):
+        """Объект по ключевому полю (номер сессии, название типа зачета)"""
+        return self.snapshot().by_key.get(value, default)
+
+    def invalidate(self):
+        """Новая версия справочника: все воркеры перечитают таблицу"""
+        self.shared_cache().set(self.version_key, uuid.uuid4().hex, None)
+        with _snapshots_lock:
+            _snapshots.pop(self.model_label, None)
+
+    def invalidate_on_commit(self):
+        transaction.on_commit(self.invalidate)
+
+
+sessions = ReferenceRegistry('core.Session', 'session_number')
+assessment_types = ReferenceRegistry('core.AssessmentType', 'name')
+
+REGISTRIES = {registry.model_label: registry for registry in (sessions, assessment_types)}
+
+
+def registry_for(model):
+    """Реестр модели или None, если модель не справочник"""
+    return REGISTRIES.get(model._meta.label)
@@ -0,0 +1,165 @@
+"""
+Защита от "стампеды" при пересчете дорогих значений кэша.
+
+get_or_compute хранит значение вместе с логическим сроком годности и
+временем его вычисления. Физически запись живет дольше (STALE_GRACE),
+поэтому после истечения срока старое значение еще доступно:
+
+- пересчет выполняет один воркер - тот, кто взял ключ блокировки
+  (cache.add); остальные в это время отдают старое значение или, если
+  serve_stale=False, ждут результат, как при отсутствии значения. Взяв
+  блокировку, воркер сначала перечитывает ключ из общего кэша: значение
+  мог только что сохранить предыдущий владелец блокировки;
+- незадолго до истечения срока значение пересчитывается заранее с
+  вероятностью, растущей к сроку и времени вычисления (алгоритм XFetch),
+  так что популярные ключи обычно не истекают вовсе; пока ранний
+  пересчет идет, остальные отдают еще не истекшее значение;
+- если старого значения нет, ожидающие воркеры недолго ждут результат
+  воркера с блокировкой и только потом считают сами.
+"""
+import math
+import random
+import time
+
+from django.core.cache import cache
+
+# Сколько секунд после истечения срока можно отдавать старое значение
+STALE_GRACE = 5 * 60
+
+# Время жизни блокировки пересчета (на случай падения воркера)
+LOCK_TIMEOUT = 30
+
+# Ожидание результата чужого пересчета, если старого значения нет
+WAIT_TIMEOUT = 2.0
+WAIT_STEP = 0.05
+
+
+def lock_cache():
+    """
+    Кэш для блокировок: общий уровень двухуровневого кэша. Блокировка не
+    должна оседать в памяти воркера, а ее снятие - сбрасывать L1 остальных.
+    """
+    return getattr(cache, 'l2', cache)
+
+
+def unwrap(entry, default=None):
+    """Значение из записи get_or_compute (или default, если записи нет)"""
+    return entry[0] if entry is not None else default
+
+
+def get_or_compute(key, compute, timeout, beta=1.0, serve_stale=True):
+    """
+    Возвращает значение ключа, при необходимости вычисляя его через compute().
+
+    timeout - срок годности значения в секундах; beta - агрессивность
+    раннего пересчета (0 - отключен); serve_stale - отдавать старое
+    значение, пока другой воркер пересчитывает ключ.
+    """
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry, beta):
+        return entry[0]
+    if acquire(key):
+        return refresh(key, compute, timeout, locked=True)
+    # Ключ пересчитывает другой воркер. Не истекшее значение (ранний
+    # пересчет XFetch) отдаем всегда, истекшее - если разрешено serve_stale
+    if entry is not None and (serve_stale or is_fresh(entry, beta=0)):
+        return entry[0]
+
+    # Ждем его результат в общем кэше: L1 может держать старую запись
+    deadline = time.time() + WAIT_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        fresh = settled(key)
+        if fresh is not None:
+            return fresh[0]
+    return refresh(key, compute, timeout, locked=False)
+
+
+def get_many_or_compute(keys, compute_many, timeout, default=None, beta=1.0):
+    """
+    Пакетный вариант get_or_compute для списка объектов.
+
+    keys - {pk: ключ кэша}; compute_many(pks) возвращает {pk: значение} для
+    промахов одним запросом (отсутствующие в ответе получают default).
+    Устаревшие и подошедшие к сроку по XFetch записи пересчитываются в том
+    же пакете, без блокировки: групповой запрос дешевле ожидания.
+    Возвращает {pk: значение}.
+    """
+    found = cache.get_many(list(keys.values()))
+    now = time.time()
+    values = {}
+    missing = []
+    for pk, key in keys.items():
+        entry = found.get(key)
+        if entry is not None and is_fresh(entry, beta, now):
+            values[pk] = entry[0]
+        else:
+            missing.append(pk)
+    if missing:
+        started = time.time()
+        computed = compute_many(missing)
+        # Время пакета делится поровну - оценка стоимости одного пересчета для XFetch
+        delta = (time.time() - started) / len(missing)
+        fresh = {pk: computed.get(pk, default) for pk in missing}
+        cache.set_many(
+            {keys[pk]: wrap(value, timeout, delta) for pk, value in fresh.items()},
+            stored_timeout(timeout),
+        )
+        values.update(fresh)
+    return values
+
+
+def is_fresh(entry, beta=1.0, now=None):
+    """Запись еще не нужно пересчитывать (с учетом раннего пересчета XFetch)"""
+    value, expires_at, delta = entry
+    # XFetch: -log(random) > 0, поэтому пересчет тем вероятнее, чем ближе срок
+    early = delta * beta * -math.log(1.0 - random.random())
+    return (now or time.time()) + early < expires_at
+
+
+def refresh(key, compute, timeout, locked):
+    """Вычисляет значение, сохраняет его и снимает блокировку"""
+    started = time.time()
+    try:
+        if locked:
+            # Старая запись могла прийти из L1, а блокировку - только что снять
+            # воркер, уже сохранивший новое значение в общий кэш
+            entry = settled(key)
+            if entry is not None:
+                return entry[0]
+        value = compute()
+        cache.set(key, wrap(value, timeout, time.time() - started), stored_timeout(timeout))
+    finally:
+        if locked:
+            release(key)
+    return value
+
+
+def settled(key):
+    """
+    Не истекшая запись из общего кэша или None. Найденная запись
+    сохраняется и в L1 вместо старой.
+    """
+    entry = lock_cache().get(key)
+    if entry is None or not is_fresh(entry, beta=0):
+        return None
+    cache.set(key, entry, entry[1] + STALE_GRACE - time.time())
+    return entry
+
+
+def wrap(value, timeout, delta=0.0):
+    """Запись в формате get_or_compute: значение, срок годности, время вычисления"""
+    return (value, time.time() + timeout, delta)
+
+
+def stored_timeout(timeout):
+    """Физический TTL записи: срок годности плюс время, когда можно отдавать старое значение"""
+    return timeout + STALE_GRACE
+
+
+def acquire(key):
+    return lock_cache().add(f"{key}:lock", 1, LOCK_TIMEOUT)
+
+
+def release(key):
+    lock_cache().delete(f"{key}:lock")
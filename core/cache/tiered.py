@@ -0,0 +1,331 @@
+"""
+Двухуровневый кэш: LRU в памяти процесса (L1) перед общим кэшем (L2).
+
+L1 - ограниченный по размеру и времени жизни словарь в каждом воркере
+gunicorn: повторное чтение ключа на странице списка не идет в БД. L2 -
+общий для всех воркеров кэш Django (PostgresCache, core/cache/postgres.py).
+
+Согласованность между воркерами - по пространствам имен ключей. Ключи с
+префиксами из L2_ONLY_PREFIXES (версии пространств имен, которые удаляет
+инвалидация) в L1 не попадают и всегда читаются из L2, поэтому их
+удаление не касается памяти других воркеров. Значения под остальными
+ключами в этом проекте - вычисляемые агрегаты: изменившиеся данные
+получают новые ключи (версионированные пространства имен), так что
+set/add согласования не требуют.
+
+Для прочих ключей остается штамп версии в L2: delete, clear, incr/decr и
+touch такого ключа записывают новый штамп, каждый воркер сверяет штамп не
+чаще раза в SYNC_INTERVAL секунд и при расхождении очищает свой L1.
+Кроме того, L1 хранит значение не дольше L1_TIMEOUT секунд.
+
+Экземпляры бэкенда Django создает на каждый поток, а под gevent - на
+каждый запрос (гринлет). Поэтому L1, штамп и счетчики хранятся на уровне
+процесса (_processes) и общие для всех экземпляров с одинаковыми
+настройками.
+
+Счетчики попаданий и промахов по уровням не чаще раза в FLUSH_INTERVAL
+секунд записываются в таблицу CacheTierMetric - по строке на воркер;
+команда monitor_performance показывает их сумму по всем воркерам. Как и
+счетчики по префиксам (core/cache/instrumented.py), запись откладывается,
+пока соединение внутри транзакции, а ошибки записи не выходят наружу.
+
+Настройка:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.tiered.TieredCache',
+            'OPTIONS': {
+                'L2': 'shared', 'MAX_ENTRIES': 5000, 'L1_TIMEOUT': 60, 'SYNC_INTERVAL': 1,
+                'L2_ONLY_PREFIXES': ['ns_version:'], 'FLUSH_INTERVAL': 30,
+            },
+        },
+        'shared': {...},
+    }
+"""
+import os
+import pickle
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+from django.utils import timezone
+
+# Ключ штампа версии в L2
+STAMP_KEY = 'tiered_cache_stamp'
+
+MISSING = object()
+
+# Состояние уровня процесса: {(LOCATION, L2): ProcessState}
+_processes = {}
+_processes_lock = threading.Lock()
+
+
+class ProcessState:
+    """L1, штамп версии и счетчики одного процесса"""
+
+    def __init__(self):
+        self.l1 = OrderedDict()
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.synced_at = 0.0
+        self.counters = {'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0}
+        self.flushed_at = time.monotonic()
+        self.pid = os.getpid()
+        self.worker = f"{socket.gethostname()}:{self.pid}:{int(time.time())}"[:100]
+
+
+def process_state(key):
+    with _processes_lock:
+        state = _processes.get(key)
+        # После fork (gunicorn --preload) у воркера свои L1 и счетчики
+        if state is None or state.pid != os.getpid():
+            state = _processes[key] = ProcessState()
+        return state
+
+
+class TieredCache(BaseCache):
+    """Кэш-бэкенд L1 (память процесса) + L2 (общий кэш)"""
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.l2_alias = options.pop('L2', location or 'shared')
+        self.l1_max_entries = int(options.pop('MAX_ENTRIES', 5000))
+        self.l1_timeout = float(options.pop('L1_TIMEOUT', 60))
+        self.sync_interval = float(options.pop('SYNC_INTERVAL', 1))
+        self.l2_only_prefixes = tuple(options.pop('L2_ONLY_PREFIXES', ()))
+        self.flush_interval = float(options.pop('FLUSH_INTERVAL', 30))
+        super().__init__({**params, 'OPTIONS': options})
+
+        self._state = process_state((location, self.l2_alias))
+        self._l1 = self._state.l1
+        self._lock = self._state.lock
+        self.counters = self._state.counters
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    # Согласованность
+
+    def _sync(self):
+        """Сверяет штамп версии с L2 и очищает L1, если он изменился"""
+        state = self._state
+        now = time.monotonic()
+        if now - state.synced_at < self.sync_interval:
+            return
+        state.synced_at = now
+        # Внутри чужой транзакции счетчики не пишем: ждем операцию вне нее
+        if now - state.flushed_at >= self.flush_interval and not transaction.get_connection().in_atomic_block:
+            state.flushed_at = now
+            self.flush_stats()
+        stamp = self.l2.get(STAMP_KEY)
+        if stamp != state.stamp:
+            with self._lock:
+                self._l1.clear()
+            state.stamp = stamp
+
+    def _bump(self, keys=None):
+        """
+        Новый штамп версии (если среди keys есть ключи, которые могут лежать
+        в L1): остальные воркеры очистят L1 при следующей сверке
+        """
+        if keys is not None and all(self._l2_only(key) for key in keys):
+            return
+        stamp = uuid.uuid4().hex
+        self.l2.set(STAMP_KEY, stamp, None)
+        self._state.stamp = stamp
+
+    def _l2_only(self, key):
+        """Ключ не кэшируется в L1 (его удаляют, а удаление не видно другим воркерам)"""
+        return key.startswith(self.l2_only_prefixes)
+
+    # L1
+
+    def _l1_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _l1_get(self, l1_key):
+        with self._lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return MISSING
+            expires_at, data = entry
+            if expires_at <= time.monotonic():
+                del self._l1[l1_key]
+                return MISSING
+            self._l1.move_to_end(l1_key)
+        return pickle.loads(data)
+
+    def _l1_set(self, l1_key, value, timeout=DEFAULT_TIMEOUT):
+        ttl = self.l1_timeout
+        backend_timeout = self.get_backend_timeout(timeout)
+        if backend_timeout is not None:
+            ttl = min(ttl, backend_timeout - time.time())
+        if ttl <= 0:
+            self._l1_delete(l1_key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[l1_key] = (time.monotonic() + ttl, data)
+            self._l1.move_to_end(l1_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, l1_key):
+        with self._lock:
+            self._l1.pop(l1_key, None)
+
+    # API кэша Django
+
+    def get(self, key, default=None, version=None):
+        if self._l2_only(key):
+            return self._l2_get(key, default, version)
+        self._sync()
+        l1_key = self._l1_key(key, version)
+        value = self._l1_get(l1_key)
+        if value is not MISSING:
+            self.counters['l1_hits'] += 1
+            return value
+        self.counters['l1_misses'] += 1
+
+        value = self._l2_get(key, MISSING, version)
+        if value is MISSING:
+            return default
+        self._l1_set(l1_key, value)
+        return value
+
+    def _l2_get(self, key, default, version):
+        value = self.l2.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.counters['l2_misses'] += 1
+            return default
+        self.counters['l2_hits'] += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missed = []
+        l2_only = []
+        for key in keys:
+            if self._l2_only(key):
+                l2_only.append(key)
+                continue
+            value = self._l1_get(self._l1_key(key, version))
+            if value is MISSING:
+                missed.append(key)
+            else:
+                found[key] = value
+        self.counters['l1_hits'] += len(found)
+        self.counters['l1_misses'] += len(missed)
+
+        if missed or l2_only:
+            # Промахи L1 и ключи только для L2 - одним запросом
+            from_l2 = self.l2.get_many(missed + l2_only, version=version)
+            self.counters['l2_hits'] += len(from_l2)
+            self.counters['l2_misses'] += len(missed) + len(l2_only) - len(from_l2)
+            for key, value in from_l2.items():
+                if not self._l2_only(key):
+                    self._l1_set(self._l1_key(key, version), value)
+            found.update(from_l2)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, self._l2_timeout(timeout), version=version)
+        if not self._l2_only(key):
+            self._l1_set(self._l1_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, self._l2_timeout(timeout), version=version)
+        for key, value in data.items():
+            if key not in failed and not self._l2_only(key):
+                self._l1_set(self._l1_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, self._l2_timeout(timeout), version=version)
+        if added and not self._l2_only(key):
+            self._l1_set(self._l1_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.l2.touch(key, self._l2_timeout(timeout), version=version)
+        self._l1_delete(self._l1_key(key, version))
+        self._bump([key])
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = self.l2.delete(key, version=version)
+        self._l1_delete(self._l1_key(key, version))
+        self._bump([key])
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version=version)
+        for key in keys:
+            self._l1_delete(self._l1_key(key, version))
+        self._bump(keys)
+
+    def has_key(self, key, version=None):
+        self._sync()
+        if self._l1_get(self._l1_key(key, version)) is not MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._l1_delete(self._l1_key(key, version))
+        self._bump([key])
+        return value
+
+    def clear(self):
+        self.l2.clear()
+        with self._lock:
+            self._l1.clear()
+        self._bump()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def _l2_timeout(self, timeout):
+        # Таймаут по умолчанию берется из настроек этого алиаса, а не L2
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    # Статистика
+
+    def tier_stats(self):
+        """Счетчики попаданий и промахов по уровням в текущем процессе"""
+        with self._lock:
+            size = len(self._l1)
+        return {**self.counters, 'l1_size': size, 'l1_max_entries': self.l1_max_entries}
+
+    def flush_stats(self):
+        """Записывает счетчики процесса в CacheTierMetric (строка воркера)"""
+        from core.models import CacheTierMetric
+
+        stats = self.tier_stats()
+        fields = list(self.counters) + ['l1_size']
+        row = CacheTierMetric(
+            worker=self._state.worker,
+            updated_at=timezone.now(),
+            **{name: stats[name] for name in fields},
+        )
+        try:
+            # Отдельная точка сохранения: ошибка не ломает транзакцию запроса
+            with transaction.atomic():
+                CacheTierMetric.objects.bulk_create(
+                    [row],
+                    update_conflicts=True,
+                    unique_fields=['worker'],
+                    update_fields=fields + ['updated_at'],
+                )
+        except Exception:
+            # Таблицы еще нет, транзакция вызывающего кода уже сломана и т.п.:
+            # счетчики накопительные, запишутся при следующем сбросе
+            pass
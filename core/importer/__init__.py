@@ -0,0 +1,6 @@
+"""
+Инструменты импорта успеваемости из Excel.
+
+Команда import_data разбирает лист в простые записи (структура сессий и
+строки студентов), а запись в БД выполняет BulkImportEngine.
+"""
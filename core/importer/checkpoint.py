@@ -0,0 +1,54 @@
+"""
+Контрольные точки импорта порциями.
+
+Загрузка идентифицируется ключом: хэшем списка записываемых строк (по
+манифесту) и размера порции. Пока манифест обновляется только после
+последней порции, повторный запуск с теми же файлами дает тот же список
+строк и тот же ключ, поэтому --resume может пропустить уже
+зафиксированные порции.
+"""
+import hashlib
+
+from core.models import ImportCheckpoint
+
+
+def run_key(manifest_rows, chunk_size):
+    """Ключ загрузки по строкам манифеста (источник, ключ строки, хэш) и размеру порции"""
+    digest = hashlib.sha256(str(chunk_size).encode('utf-8'))
+    for row in manifest_rows:
+        digest.update(f"\0{row.source}\0{row.row_key}\0{row.content_hash}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CheckpointTracker:
+    """
+    Запись прогресса загрузки в ImportCheckpoint.
+
+    start_chunk - номер первой незаписанной порции (0 без --resume).
+    commit() вызывается внутри транзакции порции, поэтому контрольная
+    точка фиксируется вместе с данными.
+    """
+
+    def __init__(self, key, chunk_size, total_rows, resume=False):
+        self.checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            run_key=key,
+            defaults={'chunk_size': chunk_size, 'total_rows': total_rows},
+        )
+        self.resumed = not created and resume and not self.checkpoint.completed and self.checkpoint.chunks_done > 0
+        self.unfinished = not created and not self.checkpoint.completed and self.checkpoint.chunks_done > 0
+        if not self.resumed and not created:
+            # Загрузка начинается заново (в том числе после завершенной)
+            self.checkpoint.rows_done = 0
+            self.checkpoint.chunks_done = 0
+            self.checkpoint.completed = False
+            self.checkpoint.save(update_fields=['rows_done', 'chunks_done', 'completed', 'updated_at'])
+
+    @property
+    def start_chunk(self):
+        return self.checkpoint.chunks_done if self.resumed else 0
+
+    def commit(self, chunk_index, rows_done, last):
+        self.checkpoint.chunks_done = chunk_index + 1
+        self.checkpoint.rows_done = rows_done
+        self.checkpoint.completed = last
+        self.checkpoint.save(update_fields=['rows_done', 'chunks_done', 'completed', 'updated_at'])
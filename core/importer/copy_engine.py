@@ -0,0 +1,145 @@
+"""
+Движок импорта через COPY для очень больших загрузок (только PostgreSQL).
+
+Студенты, зачисления и справочники записываются как в BulkImportEngine:
+им нужны первичные ключи в Python. Для посещаемости, оценок и сертификатов -
+самых больших таблиц - существующие строки не читаются в Python: данные
+передаются через COPY FROM STDIN во временные таблицы (ON COMMIT DROP),
+а затем сливаются в core_* одним INSERT ... ON CONFLICT на таблицу.
+Неизменившиеся строки не перезаписываются (условие WHERE ... IS DISTINCT FROM).
+"""
+import csv
+import io
+
+from django.db import connection
+from django.utils.timezone import localdate
+
+from core.models import Attendance, Assessment, Certificate
+from core.importer.engine import BulkImportEngine, RESULT_TYPE_NAME, to_score
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Передает строки в таблицу через COPY FROM STDIN в формате CSV"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow('' if value is None else value for value in row)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+def csv_bool(value):
+    return 't' if value else 'f'
+
+
+class CopyImportEngine(BulkImportEngine):
+    """BulkImportEngine с записью посещаемости, оценок и сертификатов через COPY"""
+
+    def run(self, jobs, chunk_size=None, start_chunk=0, on_chunk=None):
+        if connection.vendor != 'postgresql':
+            raise RuntimeError("Движок copy поддерживается только для PostgreSQL")
+        return super().run(jobs, chunk_size=chunk_size, start_chunk=start_chunk, on_chunk=on_chunk)
+
+    def merge(self, staging, columns, rows, merge_sql, params=()):
+        """Создает временную таблицу, загружает в нее строки и выполняет слияние"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE TEMPORARY TABLE {staging} ({', '.join(columns)}) ON COMMIT DROP")
+            copy_rows(cursor, staging, [column.split()[0] for column in columns], rows)
+            cursor.execute(merge_sql, params)
+            written = cursor.rowcount
+            cursor.execute(f"DROP TABLE {staging}")
+        return written
+
+    def iter_enrollment_rows(self, items, students, enrollments):
+        """(layout, запись, сессия, Enrollment) для каждой сессии каждой строки"""
+        for (layout, record), student in zip(items, students):
+            for session in self.iter_sessions(layout):
+                enrollment = enrollments[(student.pk, self.sessions[session['number']].pk)]
+                yield layout, record, session, enrollment
+
+    def sync_attendance(self, items, students, enrollments):
+        rows = {}
+        for _, record, session, enrollment in self.iter_enrollment_rows(items, students, enrollments):
+            session_id = self.sessions[session['number']].pk
+            rows[(enrollment.pk, session_id)] = csv_bool(record['presence'].get(session['number'], False))
+
+        table = Attendance._meta.db_table
+        self.stats['attendance_written'] += self.merge(
+            'import_attendance',
+            ['enrollment_id bigint', 'session_id bigint', 'present boolean'],
+            ((enrollment_id, session_id, present) for (enrollment_id, session_id), present in rows.items()),
+            f"""
+            INSERT INTO {table} (enrollment_id, session_id, present)
+            SELECT enrollment_id, session_id, present FROM import_attendance
+            ON CONFLICT (enrollment_id, session_id) DO UPDATE SET present = EXCLUDED.present
+            WHERE {table}.present IS DISTINCT FROM EXCLUDED.present
+            """,
+        )
+
+    def sync_assessments(self, items, students, enrollments):
+        result_type = self.types.get(RESULT_TYPE_NAME)
+        rows = {}
+        for _, record, session, enrollment in self.iter_enrollment_rows(items, students, enrollments):
+            for course in session['courses']:
+                course_obj = self.courses[(session['number'], course['name'])]
+                for type_info in course['assessment_types']:
+                    value = record['scores'].get((session['number'], course['name'], type_info['name']))
+                    if value is not None:
+                        type_id = self.types[type_info['name']].pk
+                        rows[(enrollment.pk, course_obj.pk, type_id)] = (to_score(value), 'f')
+                if course.get('result_column'):
+                    value = record['results'].get((session['number'], course['name']))
+                    if value is not None:
+                        rows[(enrollment.pk, course_obj.pk, result_type.pk)] = (to_score(value), 't')
+
+        table = Assessment._meta.db_table
+        self.stats['assessments_written'] += self.merge(
+            'import_assessment',
+            ['enrollment_id bigint', 'course_id bigint', 'type_id bigint', 'score numeric', 'is_final_grade boolean'],
+            (key + value for key, value in rows.items()),
+            f"""
+            INSERT INTO {table} (enrollment_id, course_id, type_id, score, date, certificate_issued, is_final_grade)
+            SELECT enrollment_id, course_id, type_id, score, %s, false, is_final_grade FROM import_assessment
+            ON CONFLICT (enrollment_id, course_id, type_id) DO UPDATE
+            SET score = EXCLUDED.score, is_final_grade = EXCLUDED.is_final_grade
+            WHERE ({table}.score, {table}.is_final_grade) IS DISTINCT FROM (EXCLUDED.score, EXCLUDED.is_final_grade)
+            """,
+            [localdate()],
+        )
+        # Оценки остаются в БД: сертификаты связываются с итоговой оценкой в SQL
+        return {}
+
+    def sync_certificates(self, items, students, enrollments, assessments):
+        result_type = self.types.get(RESULT_TYPE_NAME)
+        rows = {}
+        for layout, record, session, enrollment in self.iter_enrollment_rows(items, students, enrollments):
+            for course in session['courses']:
+                cert_status = record['certificates'].get((session['number'], course['name']))
+                if cert_status is None:
+                    continue
+                course_obj = self.courses[(session['number'], course['name'])]
+                # Без колонки результата сертификат не связывается с оценкой
+                result_enrollment = enrollment.pk if course.get('result_column') else None
+                rows[(enrollment.student_id, course_obj.pk)] = (str(cert_status), result_enrollment)
+
+        table = Certificate._meta.db_table
+        assessment_table = Assessment._meta.db_table
+        self.stats['certificates_written'] += self.merge(
+            'import_certificate',
+            ['student_id bigint', 'course_id bigint', 'type varchar', 'enrollment_id bigint'],
+            (key + value for key, value in rows.items()),
+            f"""
+            INSERT INTO {table} (student_id, course_id, assessment_id, issued_on, type)
+            SELECT s.student_id, s.course_id, a.id, %s, s.type
+            FROM import_certificate s
+            LEFT JOIN {assessment_table} a
+              ON a.enrollment_id = s.enrollment_id AND a.course_id = s.course_id AND a.type_id = %s
+            ON CONFLICT (student_id, course_id) DO UPDATE
+            SET assessment_id = EXCLUDED.assessment_id, issued_on = EXCLUDED.issued_on, type = EXCLUDED.type
+            WHERE ({table}.type, {table}.assessment_id) IS DISTINCT FROM (EXCLUDED.type, EXCLUDED.assessment_id)
+            """,
+            [localdate(), result_type.pk if result_type else None],
+        )
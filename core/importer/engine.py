@@ -0,0 +1,487 @@
+"""
+Движок массовой записи данных импорта.
+
+Вместо get_or_create на каждую ячейку движок предзагружает существующие
+записи в словари по естественным ключам, вычисляет разницу с данными из
+Excel и записывает её пакетами через bulk_create (в том числе upsert через
+update_conflicts) и bulk_update. Количество SQL запросов растет с числом
+пакетов, а не с числом ячеек.
+"""
+import copy
+import time
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils.timezone import localdate
+
+from core.models import (Session,
+                         Student,
+                         Course,
+                         Enrollment,
+                         Attendance,
+                         AssessmentType,
+                         Assessment,
+                         Certificate,
+                         Statistic,
+                         )
+from core.aggregates import refresh_course_aggregates, refresh_student_aggregates
+from core.cache.invalidation import invalidate_on_commit
+from core.cache.registry import assessment_types, sessions
+from core.importer.instrumentation import PhaseRecorder, QueryCounter
+
+RESULT_TYPE_NAME = "Результат"
+
+STATISTIC_FIELDS = (
+    'total_courses',
+    'certified',
+    'uncertified',
+    'sessions_missed',
+    'sessions_attended',
+    'sessions_late',
+)
+
+SCORE_QUANT = Decimal('0.1')
+
+
+def chunked(items, size):
+    """Разбивает последовательность на пакеты размером size"""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def to_score(value):
+    """Приводит балл из Excel к точности поля Assessment.score"""
+    return Decimal(str(value)).quantize(SCORE_QUANT)
+
+
+class BulkImportEngine:
+    """
+    Записывает результат разбора листов в БД.
+
+    Принимает список заданий (layout, rows): layout - скомпилированная
+    структура листа (SheetLayout), rows - записи студентов этого листа.
+    Все модели в записях идентифицируются естественными ключами (номер
+    сессии, название предмета, тип зачета, email/ФИО), поэтому листы из
+    разных файлов разрешаются в одни и те же объекты БД.
+    """
+
+    def __init__(self, batch_size=1000, log=None, recorder=None):
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.recorder = recorder or PhaseRecorder()
+        self.stats = {
+            'rows': 0,
+            'students_created': 0,
+            'students_updated': 0,
+            'enrollments_created': 0,
+            'attendance_written': 0,
+            'assessments_written': 0,
+            'certificates_written': 0,
+            'statistics_written': 0,
+            'queries': 0,
+            'elapsed': 0.0,
+            'rows_per_sec': 0.0,
+        }
+
+    def run(self, jobs, chunk_size=None, start_chunk=0, on_chunk=None):
+        """
+        Выполняет импорт и возвращает статистику.
+
+        Справочники записываются в отдельной транзакции, затем строки
+        записываются порциями по chunk_size студентов (по умолчанию - одна
+        порция), каждая порция - в своей транзакции. Порции с номером меньше
+        start_chunk пропускаются; on_chunk(номер, записано_строк, последняя)
+        вызывается внутри транзакции порции.
+        """
+        counter = QueryCounter()
+        started = time.monotonic()
+
+        # Плоский список (layout, запись); студенты сопоставляются по индексу в нем
+        items = [(layout, record) for layout, rows in jobs for record in rows]
+        layouts = [layout for layout, _ in jobs]
+        chunk_size = chunk_size or len(items) or 1
+        chunk_count = -(-len(items) // chunk_size)
+
+        written = 0
+        with connection.execute_wrapper(counter):
+            with transaction.atomic(), self.recorder.phase('references', rows=len(layouts)):
+                self.resolve_references(layouts)
+            for index in range(start_chunk, chunk_count):
+                chunk = items[index * chunk_size:(index + 1) * chunk_size]
+                with transaction.atomic():
+                    self.write_chunk(chunk)
+                    written += len(chunk)
+                    if on_chunk:
+                        on_chunk(index, index * chunk_size + len(chunk), index == chunk_count - 1)
+                if chunk_count > 1:
+                    self.log(f"Порция {index + 1}/{chunk_count} записана ({len(chunk)} студентов)")
+            # bulk_create не отправляет сигналы: агрегаты предметов пересчитываются один раз за загрузку
+            with transaction.atomic(), self.recorder.phase('course_aggregates', rows=len(self.courses)):
+                refresh_course_aggregates([course.pk for course in self.courses.values()], self.batch_size)
+
+        elapsed = time.monotonic() - started
+        self.stats['rows'] = written
+        self.stats['queries'] = counter.count
+        self.stats['elapsed'] = elapsed
+        self.stats['rows_per_sec'] = written / elapsed if elapsed > 0 else 0.0
+        return self.stats
+
+    def write_chunk(self, items):
+        """Записывает порцию строк: студенты, зачисления, посещаемость, оценки, сертификаты, статистика"""
+        phase = self.recorder.phase
+        rows = len(items)
+        with phase('students', rows=rows):
+            students = self.sync_students(items)
+            enrollments = self.sync_enrollments(items, students)
+        with phase('attendance_assessments', rows=rows):
+            self.sync_attendance(items, students, enrollments)
+            assessments = self.sync_assessments(items, students, enrollments)
+        with phase('certificates', rows=rows):
+            self.sync_certificates(items, students, enrollments, assessments)
+        with phase('statistics', rows=rows):
+            self.sync_statistics(items, students)
+        with phase('student_aggregates', rows=len(students)):
+            # Счетчики студентов порции - в ее же транзакции
+            refresh_student_aggregates([student.pk for student in students], self.batch_size)
+
+        # bulk_create не отправляет сигналы: кэш агрегатов сбрасываем явно после фиксации порции
+        invalidate_on_commit(
+            students=[student.pk for student in students],
+            courses=[course.pk for course in self.courses.values()],
+            assessment_types=[assessment_type.pk for assessment_type in self.types.values()],
+        )
+
+    # Справочники: сессии, предметы, типы зачетов
+
+    def resolve_references(self, layouts):
+        """Находит или создает сессии, предметы и типы зачетов из заголовков"""
+        all_sessions = [session for layout in layouts for session in layout.sessions]
+        numbers = list(dict.fromkeys(s['number'] for s in all_sessions))
+        # Сессии и типы зачетов - из справочников в памяти, с немедленной сверкой версии
+        known_sessions = sessions.snapshot(fresh=True).by_key
+        self.sessions = {n: known_sessions[n] for n in numbers if n in known_sessions}
+        missing = [Session(session_number=n) for n in numbers if n not in self.sessions]
+        if missing:
+            Session.objects.bulk_create(missing, batch_size=self.batch_size)
+            sessions.invalidate_on_commit()
+            for session in missing:
+                self.sessions[session.session_number] = session
+                self.log(f"Создана сессия №{session.session_number}")
+
+        course_keys = [
+            (s['number'], course['name'])
+            for s in all_sessions for course in s['courses']
+        ]
+        session_ids = {self.sessions[n].pk: n for n in numbers}
+        self.courses = {}
+        existing = Course.objects.filter(
+            session_id__in=session_ids,
+            title__in={name for _, name in course_keys},
+        ).order_by('id')
+        for course in existing:
+            self.courses.setdefault((session_ids[course.session_id], course.title), course)
+        missing = [
+            Course(title=name, session=self.sessions[number], description='')
+            for number, name in dict.fromkeys(course_keys)
+            if (number, name) not in self.courses
+        ]
+        if missing:
+            Course.objects.bulk_create(missing, batch_size=self.batch_size)
+            for course in missing:
+                self.courses[(course.session.session_number, course.title)] = course
+                self.log(f"Создан курс '{course.title}' для сессии №{course.session.session_number}")
+
+        # Вес берем из последней колонки с указанным процентом, как и раньше
+        weights = {}
+        for session in all_sessions:
+            for course in session['courses']:
+                for type_info in course['assessment_types']:
+                    weights.setdefault(type_info['name'], None)
+                    if type_info['weight'] is not None:
+                        weights[type_info['name']] = type_info['weight']
+                if course.get('result_column'):
+                    weights.setdefault(RESULT_TYPE_NAME, None)
+
+        # Копии: вес может измениться, а объекты справочника общие для процесса
+        known_types = assessment_types.snapshot(fresh=True).by_key
+        self.types = {name: copy.copy(known_types[name]) for name in weights if name in known_types}
+        changed = []
+        for name, assessment_type in self.types.items():
+            weight = weights[name]
+            if weight is not None and assessment_type.weight != weight:
+                assessment_type.weight = weight
+                changed.append(assessment_type)
+                self.log(f"Обновлен вес для типа зачета '{name}': {weight * 100}%")
+        if changed:
+            AssessmentType.objects.bulk_update(changed, ['weight'], batch_size=self.batch_size)
+        missing = [
+            AssessmentType(name=name, weight=weight)
+            for name, weight in weights.items() if name not in self.types
+        ]
+        if changed or missing:
+            assessment_types.invalidate_on_commit()
+        if missing:
+            AssessmentType.objects.bulk_create(missing, batch_size=self.batch_size)
+            for assessment_type in missing:
+                self.types[assessment_type.name] = assessment_type
+                weight = assessment_type.weight
+                self.log(f"Создан тип зачета '{assessment_type.name}' с весом {weight * 100 if weight else 'не указан'}%")
+
+    # Студенты
+
+    def sync_students(self, items):
+        """
+        Сопоставляет строки со студентами: сначала по email, затем по ФИО.
+        Возвращает список Student в порядке items.
+        """
+        emails = {r['email'] for _, r in items if r['email']}
+        names = {r['full_name'] for _, r in items}
+        by_email = {}
+        by_name = {}
+        for chunk in chunked(emails, self.batch_size):
+            for student in Student.objects.filter(email__in=chunk):
+                by_email[student.email] = student
+        for chunk in chunked(names, self.batch_size):
+            for student in Student.objects.filter(full_name__in=chunk).order_by('id'):
+                by_name.setdefault(student.full_name, student)
+        # Один и тот же студент должен быть одним объектом в обоих словарях
+        for name, student in list(by_name.items()):
+            if student.email in by_email:
+                by_name[name] = by_email[student.email]
+
+        students = []
+        created = []
+        dirty = {}
+        for _, record in items:
+            name = record['full_name']
+            email = record['email']
+            status = record['status']
+
+            student = by_email.get(email) if email else None
+            if student is None:
+                student = by_name.get(name)
+                if student is None:
+                    student = Student(full_name=name, email=email, status=status)
+                    created.append(student)
+                    by_name[name] = student
+                    if email:
+                        by_email[email] = student
+                    self.log(f"Создан студент '{name}' со статусом {status}")
+                elif email and not student.email:
+                    student.email = email
+                    by_email[email] = student
+                    dirty[id(student)] = student
+                    self.log(f"Обновлен email для студента '{name}'")
+            elif student.full_name != name:
+                student.full_name = name
+                by_name[name] = student
+                dirty[id(student)] = student
+                self.log(f"Обновлено имя для студента с email {email}: {name}")
+
+            if student.status != status:
+                student.status = status
+                dirty[id(student)] = student
+                self.log(f"Обновлен статус для студента {name} на {status}")
+
+            students.append(student)
+
+        if created:
+            Student.objects.bulk_create(created, batch_size=self.batch_size)
+        created_ids = {id(s) for s in created}
+        updated = [s for key, s in dirty.items() if key not in created_ids]
+        if updated:
+            Student.objects.bulk_update(updated, ['full_name', 'email', 'status'], batch_size=self.batch_size)
+        self.stats['students_created'] += len(created)
+        self.stats['students_updated'] += len(updated)
+        return students
+
+    # Зачисления, посещаемость, оценки, сертификаты
+
+    def iter_sessions(self, layout):
+        """Сессии, для которых в листе есть колонка присутствия"""
+        for session in layout.sessions:
+            if session.get('presence_column') and session['courses']:
+                yield session
+
+    def sync_enrollments(self, items, students):
+        """Создает недостающие записи о зачислении. Возвращает {(student_id, session_id): Enrollment}"""
+        enrollments = {}
+        student_ids = {s.pk for s in students}
+        for chunk in chunked(student_ids, self.batch_size):
+            for enrollment in Enrollment.objects.filter(student_id__in=chunk).only('id', 'student_id', 'session_id'):
+                enrollments[(enrollment.student_id, enrollment.session_id)] = enrollment
+
+        created = []
+        for (layout, record), student in zip(items, students):
+            for session in self.iter_sessions(layout):
+                session_obj = self.sessions[session['number']]
+                key = (student.pk, session_obj.pk)
+                if key in enrollments:
+                    continue
+                was_present = record['presence'].get(session['number'], False)
+                enrollment = Enrollment(
+                    student=student,
+                    session=session_obj,
+                    enrolled_on=localdate(),
+                    status=Enrollment.Status.COMPLETED if was_present else Enrollment.Status.PLANNED,
+                )
+                enrollments[key] = enrollment
+                created.append(enrollment)
+
+        if created:
+            Enrollment.objects.bulk_create(created, batch_size=self.batch_size)
+        self.stats['enrollments_created'] += len(created)
+        return enrollments
+
+    def sync_attendance(self, items, students, enrollments):
+        """Записывает посещаемость, если она новая или изменилась"""
+        existing = {}
+        enrollment_ids = [e.pk for e in enrollments.values()]
+        for chunk in chunked(enrollment_ids, self.batch_size):
+            queryset = Attendance.objects.filter(enrollment_id__in=chunk).values_list('enrollment_id', 'session_id', 'present')
+            for enrollment_id, session_id, present in queryset:
+                existing[(enrollment_id, session_id)] = present
+
+        pending = {}
+        for (layout, record), student in zip(items, students):
+            for session in self.iter_sessions(layout):
+                session_obj = self.sessions[session['number']]
+                enrollment = enrollments[(student.pk, session_obj.pk)]
+                key = (enrollment.pk, session_obj.pk)
+                was_present = record['presence'].get(session['number'], False)
+                if existing.get(key) == was_present:
+                    continue
+                pending[key] = Attendance(enrollment=enrollment, session=session_obj, present=was_present)
+
+        self.upsert(Attendance, pending.values(), ['enrollment', 'session'], ['present'])
+        self.stats['attendance_written'] += len(pending)
+
+    def sync_assessments(self, items, students, enrollments):
+        """
+        Записывает оценки по типам зачетов и итоговые оценки.
+        Возвращает {(enrollment_id, course_id, type_id): Assessment} для привязки сертификатов.
+        """
+        assessments = {}
+        enrollment_ids = [e.pk for e in enrollments.values()]
+        for chunk in chunked(enrollment_ids, self.batch_size):
+            queryset = Assessment.objects.filter(enrollment_id__in=chunk).only(
+                'id', 'enrollment_id', 'course_id', 'type_id', 'score', 'is_final_grade'
+            )
+            for assessment in queryset:
+                assessments[(assessment.enrollment_id, assessment.course_id, assessment.type_id)] = assessment
+
+        result_type = self.types.get(RESULT_TYPE_NAME)
+        today = localdate()
+        pending = {}
+
+        def stage(enrollment, course_obj, assessment_type, value, is_final):
+            score = to_score(value)
+            key = (enrollment.pk, course_obj.pk, assessment_type.pk)
+            current = assessments.get(key)
+            if current is not None and current.score == score and current.is_final_grade == is_final:
+                return
+            assessment = Assessment(
+                enrollment=enrollment,
+                course=course_obj,
+                type=assessment_type,
+                score=score,
+                date=today,
+                certificate_issued=False,
+                is_final_grade=is_final,
+            )
+            pending[key] = assessment
+            assessments[key] = assessment
+
+        for (layout, record), student in zip(items, students):
+            for session in self.iter_sessions(layout):
+                enrollment = enrollments[(student.pk, self.sessions[session['number']].pk)]
+                for course in session['courses']:
+                    course_obj = self.courses[(session['number'], course['name'])]
+                    for type_info in course['assessment_types']:
+                        value = record['scores'].get((session['number'], course['name'], type_info['name']))
+                        if value is not None:
+                            stage(enrollment, course_obj, self.types[type_info['name']], value, False)
+                    if course.get('result_column'):
+                        value = record['results'].get((session['number'], course['name']))
+                        if value is not None:
+                            stage(enrollment, course_obj, result_type, value, True)
+
+        self.upsert(Assessment, pending.values(), ['enrollment', 'course', 'type'], ['score', 'is_final_grade'])
+        self.stats['assessments_written'] += len(pending)
+        return assessments
+
+    def sync_certificates(self, items, students, enrollments, assessments):
+        """Записывает сертификаты, статус которых определен по цвету ячейки"""
+        existing = {}
+        student_ids = {s.pk for s in students}
+        for chunk in chunked(student_ids, self.batch_size):
+            queryset = Certificate.objects.filter(student_id__in=chunk).values_list(
+                'student_id', 'course_id', 'type', 'assessment_id'
+            )
+            for student_id, course_id, cert_type, assessment_id in queryset:
+                existing[(student_id, course_id)] = (cert_type, assessment_id)
+
+        result_type = self.types.get(RESULT_TYPE_NAME)
+        today = localdate()
+        pending = {}
+        for (layout, record), student in zip(items, students):
+            for session in self.iter_sessions(layout):
+                enrollment = enrollments[(student.pk, self.sessions[session['number']].pk)]
+                for course in session['courses']:
+                    cert_status = record['certificates'].get((session['number'], course['name']))
+                    if cert_status is None:
+                        continue
+                    course_obj = self.courses[(session['number'], course['name'])]
+                    linked_assessment = None
+                    if course.get('result_column'):
+                        linked_assessment = assessments.get((enrollment.pk, course_obj.pk, result_type.pk))
+                    key = (student.pk, course_obj.pk)
+                    linked_id = linked_assessment.pk if linked_assessment else None
+                    if existing.get(key) == (cert_status, linked_id):
+                        continue
+                    pending[key] = Certificate(
+                        student=student,
+                        course=course_obj,
+                        assessment=linked_assessment,
+                        issued_on=today,
+                        type=cert_status,
+                    )
+
+        self.upsert(Certificate, pending.values(), ['student', 'course'], ['assessment', 'issued_on', 'type'])
+        self.stats['certificates_written'] += len(pending)
+
+    def sync_statistics(self, items, students):
+        """Записывает итоговую статистику по студентам"""
+        existing = {}
+        student_ids = {s.pk for s in students}
+        for chunk in chunked(student_ids, self.batch_size):
+            for values in Statistic.objects.filter(student_id__in=chunk).values('student_id', *STATISTIC_FIELDS):
+                existing[values.pop('student_id')] = values
+
+        pending = {}
+        for (_, record), student in zip(items, students):
+            values = record['statistic']
+            if existing.get(student.pk) == values:
+                continue
+            pending[student.pk] = Statistic(student=student, **values)
+            self.log(
+                f"Статистика для {student.full_name}: прослушано {values['total_courses']}, "
+                f"освидетельствовано {values['certified']}, пропущено сессий {values['sessions_missed']}"
+            )
+
+        self.upsert(Statistic, pending.values(), ['student'], list(STATISTIC_FIELDS))
+        self.stats['statistics_written'] += len(pending)
+
+    def upsert(self, model, objs, unique_fields, update_fields):
+        """INSERT ... ON CONFLICT DO UPDATE пакетами по batch_size"""
+        objs = list(objs)
+        if not objs:
+            return
+        model.objects.bulk_create(
+            objs,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields,
+        )
@@ -0,0 +1,77 @@
+"""
+Замеры фаз импорта: время, SQL запросы, обработанные строки и пик памяти.
+
+PhaseRecorder накапливает показатели по имени фазы (при записи порциями
+одна фаза выполняется несколько раз). Пик памяти измеряется через
+tracemalloc и только если трассировка включена в текущем процессе:
+она заметно замедляет импорт, поэтому команда включает ее по запросу.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+class QueryCounter:
+    """Считает SQL запросы через execute_wrapper (работает и без DEBUG)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def empty_phase():
+    return {'calls': 0, 'seconds': 0.0, 'queries': 0, 'rows': 0, 'peak_memory': None}
+
+
+class PhaseRecorder:
+    """Накопитель показателей по фазам; фазы сохраняют порядок первого запуска"""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name, rows=0):
+        """
+        Замеряет блок кода как фазу name. Количество строк можно передать
+        сразу или увеличить через entry['rows'] внутри блока.
+        """
+        entry = self.phases.setdefault(name, empty_phase())
+        entry['rows'] += rows
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        counter = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(counter):
+                yield entry
+        finally:
+            entry['calls'] += 1
+            entry['seconds'] += time.perf_counter() - started
+            entry['queries'] += counter.count
+            if tracing:
+                # Пик относительно памяти на начало фазы
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                entry['peak_memory'] = max(entry['peak_memory'] or 0, peak)
+
+    def merge(self, phases):
+        """Добавляет показатели, замеренные в другом месте (например, в процессе пула)"""
+        for name, values in phases.items():
+            entry = self.phases.setdefault(name, empty_phase())
+            for key in ('calls', 'seconds', 'queries', 'rows'):
+                entry[key] += values[key]
+            if values['peak_memory'] is not None:
+                entry['peak_memory'] = max(entry['peak_memory'] or 0, values['peak_memory'])
+
+    def report(self):
+        """Показатели фаз в виде, пригодном для JSON"""
+        return {
+            name: {**values, 'seconds': round(values['seconds'], 4)}
+            for name, values in self.phases.items()
+        }
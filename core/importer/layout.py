@@ -0,0 +1,330 @@
+"""
+Компиляция структуры листа (заголовка) для импорта.
+
+Строки 2 и 3 листа описывают сессии, предметы, типы зачетов и служебные
+колонки. compile_layout за один проход превращает их в SheetLayout -
+неизменяемый индекс колонка -> (роль, сессия, предмет, имя). Обработка
+строк студентов после этого сводится к поиску по индексу колонки.
+
+Скомпилированная структура кэшируется на диске по отпечатку (fingerprint)
+строк заголовка, поэтому повторный импорт того же шаблона пропускает
+анализ заголовка полностью.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from decimal import Decimal
+
+from django.conf import settings
+
+# Версия компилятора: при изменении логики разбора заголовка старый кэш не используется
+LAYOUT_VERSION = 1
+
+STAT_HEADERS = (
+    ("Кол. прослушаных предметов", 'total_courses'),
+    ("Кол. освидетельствованных предметов", 'certified'),
+    ("Кол. неосвидетельствованных предметов", 'uncertified'),
+    ("Кол. пропущеных сессий", 'sessions_missed'),
+    ("К-во  сессий с момента начала обучения", 'sessions_attended'),
+    ("К обуч. приступил с опозданием", 'sessions_late'),
+)
+
+# Без этих колонок статистика не читается (записываются нули)
+REQUIRED_STAT_FIELDS = ('total_courses', 'certified', 'uncertified', 'sessions_missed', 'sessions_attended')
+
+# Роли колонок в индексе
+PRESENCE = 'presence'
+SCORE = 'score'
+RESULT = 'result'
+CERTIFICATE = 'certificate'
+STAT = 'stat'
+
+
+def header_fingerprint(header):
+    """Отпечаток строк заголовка 2 и 3 (с учетом версии компилятора)"""
+    payload = json.dumps(
+        [LAYOUT_VERSION, header.get(2, []), header.get(3, [])],
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def numeric(value):
+    """Значение ячейки, если это число, иначе None"""
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+class SheetLayout:
+    """
+    Скомпилированная структура листа.
+
+    sessions - сессии с предметами и типами зачетов в формате, который
+    принимает BulkImportEngine; index[column] - кортеж ролей колонки.
+    """
+
+    __slots__ = ('fingerprint', 'sessions', 'stat_columns', 'index', 'value_columns', 'fill_columns')
+
+    def __init__(self, fingerprint, sessions, stat_columns, entries):
+        self.fingerprint = fingerprint
+        self.sessions = tuple(sessions)
+        self.stat_columns = dict(stat_columns)
+
+        width = max((entry[0] for entry in entries), default=0) + 1
+        index = [[] for _ in range(width)]
+        for column, role, session_number, course_name, name in entries:
+            index[column].append((role, session_number, course_name, name))
+        self.index = tuple(tuple(roles) for roles in index)
+        self.value_columns = frozenset(column for column, roles in enumerate(self.index) if roles)
+        self.fill_columns = frozenset(
+            entry[0] for entry in entries if entry[1] == CERTIFICATE
+        )
+
+    @property
+    def entries(self):
+        return [
+            (column, *role)
+            for column, roles in enumerate(self.index)
+            for role in roles
+        ]
+
+    def build_record(self, sheet_row, status, cert_styles):
+        """
+        Собирает запись студента для движка импорта из строки листа.
+        cert_styles - статус сертификата по номеру стиля ячейки (SheetReader.style_lookup).
+        """
+        record = {
+            'row': sheet_row.row,
+            'full_name': sheet_row.name,
+            'email': sheet_row.email,
+            'status': status,
+            'presence': {s['number']: False for s in self.sessions if s.get('presence_column')},
+            'scores': {},
+            'results': {},
+            'certificates': {},
+            'statistic': {field: 0 for _, field in STAT_HEADERS},
+        }
+        index = self.index
+        for column, value in sheet_row.values.items():
+            for role, session_number, course_name, name in index[column]:
+                if role == SCORE:
+                    score = numeric(value)
+                    if score is not None:
+                        record['scores'][(session_number, course_name, name)] = score
+                elif role == RESULT:
+                    score = numeric(value)
+                    if score is not None:
+                        record['results'][(session_number, course_name)] = score
+                elif role == PRESENCE:
+                    record['presence'][session_number] = bool(value)
+                elif role == CERTIFICATE:
+                    # Сертификат учитываем только если в ячейке есть значение И известный цвет
+                    cert_status = cert_styles[sheet_row.fills.get(column, 0)]
+                    if value and cert_status is not None:
+                        record['certificates'][(session_number, course_name)] = cert_status
+                elif role == STAT:
+                    count = numeric(value)
+                    record['statistic'][name] = int(count) if count is not None else 0
+        return record
+
+    def to_dict(self):
+        sessions = [
+            {**session, 'courses': [
+                {**course, 'assessment_types': [
+                    {**type_info, 'weight': str(type_info['weight']) if type_info['weight'] is not None else None}
+                    for type_info in course['assessment_types']
+                ]}
+                for course in session['courses']
+            ]}
+            for session in self.sessions
+        ]
+        return {
+            'version': LAYOUT_VERSION,
+            'fingerprint': self.fingerprint,
+            'sessions': sessions,
+            'stat_columns': self.stat_columns,
+            'entries': self.entries,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        for session in data['sessions']:
+            for course in session['courses']:
+                for type_info in course['assessment_types']:
+                    if type_info['weight'] is not None:
+                        type_info['weight'] = Decimal(type_info['weight'])
+        return cls(data['fingerprint'], data['sessions'], data['stat_columns'], [tuple(e) for e in data['entries']])
+
+
+def compile_layout(header, log=None):
+    """
+    Разбирает строки 2 и 3 заголовка в SheetLayout.
+
+    Предметы и служебные колонки привязываются к сессиям и предметам по
+    близости колонок, как в исходном шаблоне таблицы.
+    """
+    log = log or (lambda message: None)
+    fingerprint = header_fingerprint(header)
+
+    # 1. Структура сессий и предметов (строка 2)
+    sessions_data = []
+    current_session = None
+    for column, value in header.get(2, []):
+        if not value or not isinstance(value, str):
+            continue
+        cell_value = value.strip()
+
+        # Проверяем, является ли ячейка заголовком сессии (формат: "X с")
+        session_match = re.match(r'^(\d+)\s*с.*$', cell_value)
+        if session_match:
+            current_session = {
+                'number': int(session_match.group(1)),
+                'column': column,
+                'courses': []
+            }
+            sessions_data.append(current_session)
+        elif current_session and cell_value:
+            # Пропускаем "Персональную успеваемость", т.к. это не предмет
+            if "Персональная успеваемость" in cell_value:
+                log(f"Обнаружена 'Персональная успеваемость' в колонке {column}, будет обработана как статистика")
+                continue
+            current_session['courses'].append({
+                'name': cell_value,
+                'column': column,
+                'assessment_types': []
+            })
+
+    for session in sessions_data:
+        log(f"Сессия №{session['number']} содержит {len(session['courses'])} предметов:")
+        for course in session['courses']:
+            log(f"  - {course['name']} (колонка {course['column']})")
+
+    # 2. Типы зачетов и служебные колонки (строка 3)
+    stat_columns = {field: None for _, field in STAT_HEADERS}
+    row2_values = dict(header.get(2, []))
+    certificate_columns = 0
+
+    for column, value in header.get(3, []):
+        if not value:
+            continue
+        cell_value = str(value).strip()
+
+        stat_field = next((field for title, field in STAT_HEADERS if title in cell_value), None)
+        if "Присутствие" in cell_value:
+            for session in sessions_data:
+                if abs(session['column'] - column) < 10:  # примерное расстояние
+                    session['presence_column'] = column
+                    log(f"Для сессии {session['number']} колонка присутствия: {column}")
+        elif stat_field:
+            stat_columns[stat_field] = column
+            log(f"Найдена колонка статистики: '{cell_value}' в колонке {column}")
+        elif "Результат" in cell_value:
+            for session in sessions_data:
+                for course in session['courses']:
+                    if abs(course['column'] - column) < 7:  # примерное расстояние
+                        course['result_column'] = column
+                        log(f"Для курса '{course['name']}' колонка результата: {column}")
+        elif "Свидетельст" in cell_value:
+            certificate_columns += 1
+            course = next((
+                course for session in sessions_data for course in session['courses']
+                if abs(course['column'] - column) < 7
+            ), None)
+            if course:
+                course['certificate_column'] = column
+                log(f"Для курса '{course['name']}' колонка свидетельства: {column}")
+            else:
+                log(f"Найдена независимая колонка сертификатов: {cell_value} (колонка {column})")
+        elif cell_value not in ["Ф.И.О."]:
+            # Проверяем, есть ли над ячейкой процент веса (например, "75%")
+            weight = None
+            weight_cell_value = row2_values.get(column)
+            if weight_cell_value and isinstance(weight_cell_value, str) and "%" in weight_cell_value:
+                weight_match = re.search(r'(\d+)%', weight_cell_value)
+                if weight_match:
+                    weight = Decimal(weight_match.group(1)) / Decimal(100)
+                    log(f"Найден вес {weight * 100}% для типа зачета '{cell_value}'")
+            course = next((
+                course for session in sessions_data for course in session['courses']
+                if abs(course['column'] - column) < 7
+            ), None)
+            if course:
+                course['assessment_types'].append({
+                    'name': cell_value,
+                    'column': column,
+                    'weight': weight
+                })
+                log(f"Для курса '{course['name']}' тип зачета '{cell_value}' (колонка {column})")
+
+    log(f"Найдено {certificate_columns} колонок сертификатов")
+
+    # 3. Индекс колонок - только для сессий с колонкой присутствия
+    entries = []
+    for session in sessions_data:
+        if 'presence_column' not in session:
+            log(f"Пропускаем сессию {session['number']} - нет колонки присутствия")
+            continue
+        number = session['number']
+        entries.append((session['presence_column'], PRESENCE, number, None, None))
+        for course in session['courses']:
+            for type_info in course['assessment_types']:
+                entries.append((type_info['column'], SCORE, number, course['name'], type_info['name']))
+            if 'result_column' in course:
+                entries.append((course['result_column'], RESULT, number, course['name'], None))
+            if 'certificate_column' in course:
+                entries.append((course['certificate_column'], CERTIFICATE, number, course['name'], None))
+    if all(stat_columns[field] for field in REQUIRED_STAT_FIELDS):
+        for field, column in stat_columns.items():
+            if column:
+                entries.append((column, STAT, None, None, field))
+
+    return SheetLayout(fingerprint, sessions_data, stat_columns, entries)
+
+
+class LayoutCache:
+    """Дисковый кэш скомпилированных структур листа: один JSON файл на отпечаток"""
+
+    def __init__(self, directory=None):
+        self.directory = directory or settings.IMPORT_LAYOUT_CACHE_DIR
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, f"{fingerprint}.json")
+
+    def get(self, fingerprint):
+        try:
+            with open(self.path(fingerprint), encoding='utf-8') as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != LAYOUT_VERSION:
+            return None
+        return SheetLayout.from_dict(data)
+
+    def set(self, layout):
+        os.makedirs(self.directory, exist_ok=True)
+        # Пишем во временный файл и переименовываем, чтобы параллельный импорт не прочитал половину файла
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+            json.dump(layout.to_dict(), fh, ensure_ascii=False)
+        os.replace(tmp_path, self.path(layout.fingerprint))
+
+
+def load_layout(header, cache=None, log=None):
+    """
+    Возвращает (SheetLayout, из_кэша). При промахе компилирует заголовок
+    и сохраняет результат в кэш.
+    """
+    cache = cache or LayoutCache()
+    fingerprint = header_fingerprint(header)
+    layout = cache.get(fingerprint)
+    if layout is not None:
+        return layout, True
+    layout = compile_layout(header, log=log)
+    try:
+        cache.set(layout)
+    except OSError:
+        # Кэш - только ускорение: без прав на запись просто компилируем каждый раз
+        pass
+    return layout, False
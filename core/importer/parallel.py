@@ -0,0 +1,87 @@
+"""
+Параллельный разбор нескольких файлов и листов.
+
+Листы разбираются в пуле процессов (parse_sheet не пишет в БД), а
+результаты собираются в родительском процессе, где их записывает один
+BulkImportEngine. Модуль не импортирует модели на верхнем уровне, чтобы
+init_worker мог настроить Django в дочернем процессе при любом способе
+запуска (fork/spawn/forkserver).
+"""
+import glob
+import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from django import db
+
+EXCEL_PATTERNS = ('*.xlsx', '*.xlsm')
+
+
+def expand_paths(paths):
+    """
+    Раскрывает аргументы команды в список файлов: файл как есть, каталог -
+    все книги Excel в нем, остальное - glob-шаблон.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in EXCEL_PATTERNS:
+                files.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        elif glob.has_magic(path):
+            files.extend(sorted(glob.glob(path, recursive=True)))
+        else:
+            files.append(path)
+    # Временные файлы Excel (~$book.xlsx) - это блокировки, а не книги
+    files = [f for f in files if not os.path.basename(f).startswith('~$')]
+    return list(dict.fromkeys(files))
+
+
+def init_worker():
+    """Инициализация Django в процессе пула"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Online_school.settings')
+    import django
+    django.setup()
+
+
+def parse_job(job):
+    """
+    Разбирает один лист; сообщения лога возвращаются вместе с результатом.
+    Без verbose сообщения не собираются; при trace_memory пик памяти
+    замеряется и в процессе пула.
+    """
+    from core.importer.parser import parse_sheet
+
+    path, sheet_name, require_sessions, verbose, trace_memory = job
+    messages = []
+    started = trace_memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        result = parse_sheet(
+            path, sheet_name,
+            require_sessions=require_sessions,
+            log=messages.append if verbose else None,
+        )
+    finally:
+        if started:
+            tracemalloc.stop()
+    result['messages'] = messages
+    return result
+
+
+def parse_all(jobs, workers=None):
+    """
+    Разбирает задания (path, sheet_name, require_sessions, verbose, trace_memory) и отдает
+    результаты в порядке заданий. При workers <= 1 или одном задании пул
+    не создается.
+    """
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        for job in jobs:
+            yield parse_job(job)
+        return
+
+    # Соединения с БД не должны наследоваться дочерними процессами
+    db.connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+        yield from pool.map(parse_job, jobs)
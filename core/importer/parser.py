@@ -0,0 +1,135 @@
+"""
+Разбор одного листа Excel в простые записи для движка импорта.
+
+parse_sheet не обращается к БД: результат состоит только из
+SheetLayout и словарей, поэтому его можно выполнять в отдельном
+процессе и передавать обратно через pickle.
+"""
+import re
+
+from core.models import Student, Certificate
+from core.importer.instrumentation import PhaseRecorder
+from core.importer.layout import load_layout
+from core.importer.reader import SheetReader
+
+# Словарь для хранения цветов свидетельств и их значений
+# Соответствие согласно легенде в строках 75-85
+CERT_COLORS = {
+    'FFFFFF00': Certificate.Status.CONDITIONALLY,     # желтый - Условно-освидетельствованны: не все выполнено
+    'FF00B0F0': Certificate.Status.IN_PROGRESS,       # синий - Приготовить свидетельства
+    'FF7030A0': Certificate.Status.CONTROL_RECEIVED,  # фиолетовый - Условно-освидетельствованны: поступила контрольная
+    'theme_9': Certificate.Status.COMPLETED           # theme color 9 - Свидетельства готовы в э-форме
+}
+
+# Строки легенды цветов (проверяются после чтения листа)
+COLOR_LEGEND = {
+    76: "Условно-освидетельствованны: не все выполнено",  # FFFFFF00 (желтый)
+    79: "Приготовить свидетельства",                     # FF00B0F0 (синий)
+    82: "Условно-освидетельствованны: поступила контрольная",  # FF7030A0 (фиолетовый)
+    85: "Свидетельства готовы в э-форме"                 # theme_9
+}
+
+# Статус сертификата, который описывает каждая строка легенды
+LEGEND_STATUSES = {
+    76: Certificate.Status.CONDITIONALLY,
+    79: Certificate.Status.IN_PROGRESS,
+    82: Certificate.Status.CONTROL_RECEIVED,
+    85: Certificate.Status.COMPLETED,
+}
+
+# Список слов, которые указывают, что строка не содержит данных о студенте
+NON_STUDENT_PATTERNS = [
+    r'^\d+-\d+\s*=',  # Например: "91-100 = очень хорошо"
+    r'^Условно-освидетельствованны',
+    r'^Приготовить свидетельства',
+    r'^Свидетельства готовы',
+    r'^Приостановленное обучение',
+    r'^\d+$'  # Только цифры
+]
+
+
+def parse_sheet(path, sheet_name=None, require_sessions=False, log=None):
+    """
+    Читает лист (по умолчанию активный) и возвращает словарь:
+    source, sheet, layout, layout_cached, skipped, rows, legend, legend_errors,
+    phases (замеры фаз open, header и parse_rows для PhaseRecorder.merge).
+
+    При require_sessions лист без структуры сессий пропускается - так
+    служебные листы книги не превращаются в студентов.
+    """
+    log = log or (lambda message: None)
+    recorder = PhaseRecorder()
+    with recorder.phase('open'):
+        reader = SheetReader(path, sheet_name)
+    with reader:
+        with recorder.phase('header', rows=1):
+            sheet = reader.worksheet.title
+            layout, cached = load_layout(reader.read_header(), log=log)
+        if cached:
+            log(f"Структура листа взята из кэша ({layout.fingerprint[:12]})")
+
+        result = {
+            'source': str(path),
+            'sheet': sheet,
+            'layout': layout,
+            'layout_cached': cached,
+            'skipped': False,
+            'rows': [],
+            'legend': {},
+            'legend_errors': [],
+            'phases': recorder.phases,
+        }
+        if require_sessions and not layout.sessions:
+            log(f"Лист '{sheet}' пропущен: не найдена структура сессий")
+            result['skipped'] = True
+            return result
+
+        # Статус сертификата по номеру стиля - один раз для всей книги
+        cert_styles = reader.style_lookup(CERT_COLORS)
+
+        with recorder.phase('parse_rows') as phase:
+            # Все строки после надписи "Приостановленное обучение" - приостановленные студенты
+            suspended_row = None
+            for sheet_row in reader.iter_rows(layout.value_columns, layout.fill_columns, legend_rows=COLOR_LEGEND):
+                student_name = sheet_row.name
+
+                if suspended_row is None and "Приостановленное обучение" in str(student_name):
+                    suspended_row = sheet_row.row
+                    log(f"Найдена строка с надписью 'Приостановленное обучение': {suspended_row}")
+
+                # Проверяем, является ли строка не-студентом (пояснение, заголовок и т.д.)
+                if any(re.search(pattern, str(student_name)) for pattern in NON_STUDENT_PATTERNS):
+                    log(f"Пропускаем не-студента: '{student_name}'")
+                    continue
+
+                # Определяем, является ли студент приостановленным
+                is_suspended = suspended_row is not None
+                if is_suspended:
+                    log(f"Студент '{student_name}' имеет приостановленное обучение")
+
+                status = Student.Status.SUSPENDED if is_suspended else Student.Status.ACTIVE
+                result['rows'].append(layout.build_record(sheet_row, status, cert_styles))
+            phase['rows'] = len(result['rows'])
+
+            result['legend'] = dict(reader.legend)
+            result['legend_errors'] = validate_legend(result['legend'])
+    return result
+
+
+def validate_legend(legend):
+    """
+    Сверяет цвета строк легенды с CERT_COLORS: цвет каждой строки должен
+    давать тот статус, который она описывает. Возвращает список ошибок.
+    """
+    errors = []
+    for row, expected in LEGEND_STATUSES.items():
+        color_code = legend.get(row)
+        if color_code is None:
+            continue
+        actual = CERT_COLORS.get(color_code)
+        if actual != expected:
+            errors.append(
+                f"Легенда: цвет {color_code} в строке {row} соответствует статусу "
+                f"'{actual.label if actual else 'неизвестен'}', ожидался '{expected.label}'"
+            )
+    return errors
@@ -0,0 +1,175 @@
+"""
+Потоковое чтение листа Excel для импорта.
+
+Книга открывается один раз в режиме read_only с вычисленными значениями
+(data_only=True). Цвет заливки в этом режиме доступен через таблицу стилей
+книги, поэтому вторая загрузка с data_only=False не нужна: цвета всех стилей
+вычисляются один раз при открытии книги, а для ячейки запоминается только
+номер ее стиля (style id). Строки читаются
+последовательно, и для каждой строки студента остается только компактная
+запись с нужными колонками - в памяти одновременно одна строка листа.
+"""
+import zipfile
+from xml.etree import ElementTree
+
+import openpyxl
+
+# Строки 1-3 содержат заголовок: сессии, предметы и типы зачетов
+HEADER_ROWS = 3
+
+# Колонка с ФИО студента
+NAME_COLUMN = 2
+
+# Пространство имен SpreadsheetML для разбора xl/workbook.xml
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+# Связи листов книги (xl/_rels/workbook.xml.rels): тип отличает лист с
+# ячейками (worksheet) от листа-диаграммы (chartsheet)
+RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_RELATIONSHIP_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+def list_sheets(path):
+    """
+    Имена листов с ячейками (без диаграмм) без загрузки самой книги:
+    читаются только xl/workbook.xml и его связи из архива.
+    """
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    types = {rel.get('Id'): rel.get('Type', '') for rel in rels.iter(f'{PACKAGE_RELATIONSHIP_NS}Relationship')}
+    return [
+        sheet.get('name')
+        for sheet in root.iter(f'{SPREADSHEET_NS}sheet')
+        if types.get(sheet.get(f'{RELATIONSHIP_NS}id'), '').endswith('/worksheet')
+    ]
+
+
+def fill_key(fill):
+    """Ключ цвета заливки: 'theme_N' для цвета темы, ARGB для обычного цвета"""
+    if fill is None:
+        return None
+    color_obj = getattr(fill, 'fgColor', None)
+    if color_obj is None:
+        return None
+    if color_obj.type == 'theme':
+        return f"theme_{color_obj.theme}"
+    rgb = color_obj.rgb
+    if isinstance(rgb, str) and rgb not in ("00000000", "FFFFFFFF"):
+        return rgb
+    return None
+
+
+def style_id(cell):
+    """Номер стиля ячейки в таблице стилей книги (у пустых ячеек - 0)"""
+    return getattr(cell, '_style_id', 0)
+
+
+def style_fill_keys(workbook):
+    """Ключ цвета заливки для каждого стиля книги: индекс кортежа - style id"""
+    fills = [fill_key(fill) for fill in workbook._fills]
+    return tuple(
+        fills[style.fillId] if style.fillId < len(fills) else None
+        for style in workbook._cell_styles
+    )
+
+
+class SheetRow:
+    """Компактная запись строки листа: только нужные значения и номера стилей"""
+
+    __slots__ = ('row', 'name', 'email', 'values', 'fills')
+
+    def __init__(self, row, name, email, values, fills):
+        self.row = row
+        self.name = name
+        self.email = email
+        self.values = values
+        self.fills = fills
+
+
+class SheetReader:
+    """
+    Однопроходный читатель листа.
+
+    Сначала read_header() забирает строки заголовка, затем iter_rows()
+    продолжает тот же проход по листу с первой строки данных.
+    """
+
+    def __init__(self, path, sheet_name=None):
+        self.workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        self.worksheet = self.workbook[sheet_name] if sheet_name else self.workbook.active
+        self.fill_keys = style_fill_keys(self.workbook)
+        self._rows = self.worksheet.iter_rows()
+        self._row_number = 0
+        self.legend = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.workbook.close()
+
+    def style_lookup(self, colors):
+        """
+        Переводит словарь {ключ цвета: значение} в кортеж, индексируемый
+        номером стиля. Классификация ячейки после этого - поиск по индексу.
+        """
+        return tuple(colors.get(key) for key in self.fill_keys)
+
+    def read_header(self):
+        """Возвращает {номер строки: [(колонка, значение), ...]} для строк заголовка"""
+        header = {}
+        for cells in self._rows:
+            self._row_number += 1
+            header[self._row_number] = [
+                (column, cell.value)
+                for column, cell in enumerate(cells, start=1)
+                if cell.value is not None
+            ]
+            if self._row_number >= HEADER_ROWS:
+                break
+        return header
+
+    def iter_rows(self, value_columns, fill_columns, legend_rows=()):
+        """
+        Построчно отдает SheetRow для строк с непустым ФИО.
+
+        value_columns - колонки, значения которых нужны; fill_columns - колонки,
+        для которых нужен номер стиля (цвет заливки). Цвета ячеек ФИО в строках
+        legend_rows сохраняются в self.legend для проверки легенды.
+        """
+        value_columns = frozenset(value_columns)
+        fill_columns = frozenset(fill_columns)
+        legend_rows = frozenset(legend_rows)
+
+        for cells in self._rows:
+            self._row_number += 1
+            row = self._row_number
+            if not cells or len(cells) < NAME_COLUMN:
+                continue
+
+            name_cell = cells[NAME_COLUMN - 1]
+            if row in legend_rows:
+                self.legend[row] = self.fill_keys[style_id(name_cell)]
+            if not name_cell.value:
+                continue
+
+            values = {}
+            fills = {}
+            email = None
+            for column, cell in enumerate(cells, start=1):
+                value = cell.value
+                if value is None:
+                    continue
+                # Email - последняя строковая ячейка с '@' в строке
+                if isinstance(value, str) and '@' in value and column > 1:
+                    email = value
+                if column in value_columns:
+                    values[column] = value
+                if column in fill_columns:
+                    fills[column] = style_id(cell)
+
+            yield SheetRow(row, name_cell.value, email, values, fills)
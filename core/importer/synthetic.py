@@ -0,0 +1,128 @@
+"""
+Генерация синтетических книг Excel в формате, который ожидает импорт.
+
+Используется для замеров скорости импорта: структура заголовка
+(сессии, предметы, типы зачетов, присутствие, результаты, свидетельства,
+блок "Персональная успеваемость") совпадает с рабочим шаблоном таблицы.
+"""
+import random
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill
+from openpyxl.styles.colors import Color
+
+from core.importer.layout import STAT_HEADERS
+
+# Названия типов зачетов (берутся первые types)
+ASSESSMENT_TYPES = ("Контрольная", "Чтение книг", "Доклад", "Тест", "Эссе")
+
+# Блок предмета: типы зачетов, результат, свидетельство. Колонки привязываются
+# к предмету на расстоянии < 7, поэтому типов не больше пяти, а блоки
+# соседних предметов отстоят друг от друга не меньше чем на 7 колонок
+MAX_ASSESSMENT_TYPES = len(ASSESSMENT_TYPES)
+MIN_COURSE_WIDTH = 7
+
+# Минимальная ширина блока сессии, чтобы колонки присутствия не привязывались к соседней сессии
+MIN_SESSION_WIDTH = 12
+
+# Заливки свидетельств (ключи CERT_COLORS)
+CERTIFICATE_FILLS = (
+    PatternFill("solid", fgColor="FFFFFF00"),
+    PatternFill("solid", fgColor="FF00B0F0"),
+    PatternFill("solid", fgColor="FF7030A0"),
+    PatternFill("solid", fgColor=Color(theme=9)),
+)
+
+
+def generate_workbook(path, students=100, sessions=1, courses=2, types=3, suspended=1, seed=0):
+    """
+    Создает книгу с одним листом и сохраняет ее в path.
+
+    students - число студентов, sessions - число сессий, courses - число
+    предметов в каждой сессии, types - число типов зачетов в предмете,
+    suspended - число студентов в разделе "Приостановленное обучение".
+    Данные детерминированы по seed.
+    """
+    if not 1 <= types <= MAX_ASSESSMENT_TYPES:
+        raise ValueError(f"Количество типов зачетов должно быть от 1 до {MAX_ASSESSMENT_TYPES}")
+    type_names = ASSESSMENT_TYPES[:types]
+    course_width = max(types + 3, MIN_COURSE_WIDTH)
+    rng = random.Random(seed)
+
+    # Разметка колонок: сессии и предметы
+    header2 = {}
+    header3 = {2: "Ф.И.О."}
+    blocks = []
+    column = 3
+    for session_number in range(1, sessions + 1):
+        header2[column] = f"{session_number} с"
+        header3[column] = "Присутствие"
+        presence_column = column
+        course_columns = []
+        for course_number in range(1, courses + 1):
+            course_column = column + 1 + (course_number - 1) * course_width
+            header2[course_column] = f"Предмет {session_number}.{course_number}"
+            for offset, type_name in enumerate(type_names):
+                header3[course_column + offset] = type_name
+            header3[course_column + types] = "Результат"
+            header3[course_column + types + 1] = "Свидетельство"
+            course_columns.append(course_column)
+        blocks.append((presence_column, course_columns))
+        column += max(1 + courses * course_width, MIN_SESSION_WIDTH)
+
+    # Блок статистики отделен от последней сессии
+    stat_column = column + 3
+    header2[stat_column] = "Персональная успеваемость"
+    for offset, (title, _) in enumerate(STAT_HEADERS):
+        header3[stat_column + offset] = title
+    email_column = stat_column + len(STAT_HEADERS) + 1
+
+    # Книга пишется потоково (write_only): в памяти одна строка листа
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet("Успеваемость")
+
+    def make_row(cells):
+        row = [None] * (max(cells) if cells else 0)
+        for index, value in cells.items():
+            row[index - 1] = value
+        return row
+
+    def student_row(number):
+        cells = {2: f"Студент {number:06d}"}
+        attended = 0
+        certified = 0
+        for presence_column, course_columns in blocks:
+            present = rng.random() < 0.8
+            attended += present
+            if present:
+                cells[presence_column] = 1
+            for course_column in course_columns:
+                for offset in range(types):
+                    if rng.random() < 0.9:
+                        cells[course_column + offset] = rng.randint(50, 100)
+                cells[course_column + types] = round(rng.uniform(50, 100), 1)
+                if rng.random() < 0.5:
+                    certified += 1
+                    cell = WriteOnlyCell(worksheet, value="да")
+                    cell.fill = rng.choice(CERTIFICATE_FILLS)
+                    cells[course_column + types + 1] = cell
+        total = sessions * courses
+        stat_values = (total, certified, total - certified, sessions - attended, attended, 0)
+        for offset, value in enumerate(stat_values):
+            cells[stat_column + offset] = value
+        cells[email_column] = f"student{number:06d}@example.com"
+        return make_row(cells)
+
+    worksheet.append([])
+    worksheet.append(make_row(header2))
+    worksheet.append(make_row(header3))
+    for number in range(students):
+        worksheet.append(student_row(number))
+    if suspended:
+        worksheet.append(make_row({2: "Приостановленное обучение"}))
+        for number in range(students, students + suspended):
+            worksheet.append(student_row(number))
+
+    workbook.save(path)
+    return path
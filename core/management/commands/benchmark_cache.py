@@ -0,0 +1,140 @@
+import json
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.commands.createcachetable import Command as CreateCacheTableCommand
+from django.db import DEFAULT_DB_ALIAS, connection
+
+from core.cache.postgres import PostgresCache
+from core.cache.stampede import wrap
+from core.importer.instrumentation import QueryCounter
+
+# Временные таблицы замера (удаляются после замера)
+TABLES = {
+    'database': 'benchmark_database_cache',
+    'postgres': 'benchmark_postgres_cache',
+}
+
+# Значение, похожее на HTML блока быстрой статистики студента
+HTML_ROW = '<div>📚 Прослушано: <strong style="color: #28a745;">{}</strong></div>\n'
+
+
+class Command(BaseCommand):
+    help = "Сравнение кэш-бэкендов: DatabaseCache и PostgresCache (время, SQL запросы, размер таблицы)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000, help='Количество ключей в set_many/get_many')
+        parser.add_argument('--single', type=int, default=100, help='Количество одиночных get/set/add')
+        parser.add_argument('--repeat', type=int, default=3, help='Количество прогонов каждого бэкенда')
+        parser.add_argument('--max-entries', type=int, default=20000, help='MAX_ENTRIES обоих бэкендов')
+        parser.add_argument(
+            '--backends',
+            nargs='+',
+            choices=list(TABLES),
+            default=list(TABLES),
+            help='Бэкенды для сравнения (postgres - только PostgreSQL)',
+        )
+        parser.add_argument('--report', type=str, help='Записать результаты в JSON файл')
+
+    def handle(self, *args, **options):
+        names = list(dict.fromkeys(options['backends']))
+        if 'postgres' in names and connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING("⚠️ PostgresCache доступен только для PostgreSQL - бэкенд пропущен"))
+            names.remove('postgres')
+        if not names:
+            raise CommandError("Нет доступных бэкендов для замера")
+
+        backends = {name: self.create_backend(name, options['max_entries']) for name in names}
+        values = {
+            'aggregate': lambda i: wrap(i / 7, 3600),
+            'html': lambda i: ''.join(HTML_ROW.format(i + row) for row in range(20)),
+        }
+
+        results = {}
+        try:
+            for kind, make_value in values.items():
+                self.stdout.write(f"\n📝 Значения: {kind} ({len(repr(make_value(0)))} символов)")
+                data = {f'benchmark:{kind}:{i}': make_value(i) for i in range(options['keys'])}
+                results[kind] = {}
+                for name, backend in backends.items():
+                    results[kind][name] = self.measure(name, backend, data, options)
+        finally:
+            self.drop_tables(names)
+
+        self.stdout.write('\n📊 Лучший результат (секунды / SQL запросы):')
+        for kind, by_backend in results.items():
+            for name, ops in by_backend.items():
+                line = [f"  {kind:<9} {name:<8}"]
+                for op, run in ops.items():
+                    if op == 'table_size':
+                        continue
+                    line.append(f"{op}: {run['seconds']:.3f}s/{run['queries']}")
+                if ops['table_size'] is not None:
+                    line.append(f"таблица: {ops['table_size'] / 1024:.0f} КБ")
+                self.stdout.write(' | '.join(line))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f"📊 Отчет записан в {options['report']}")
+
+    def create_backend(self, name, max_entries):
+        """Бэкенд на собственной временной таблице"""
+        table = TABLES[name]
+        if name == 'database':
+            backend = DatabaseCache(table, {'OPTIONS': {'MAX_ENTRIES': max_entries}})
+            command = CreateCacheTableCommand()
+            command.verbosity = 0
+            command.create_table(DEFAULT_DB_ALIAS, table, dry_run=False)
+        else:
+            # Фоновая чистка в замер не входит
+            backend = PostgresCache(table, {'OPTIONS': {'MAX_ENTRIES': max_entries, 'CULL_INTERVAL': 10 ** 9}})
+            backend.create_table(drop=True)
+        return backend
+
+    def drop_tables(self, names):
+        with connection.cursor() as cursor:
+            for name in names:
+                cursor.execute(f"DROP TABLE IF EXISTS {connection.ops.quote_name(TABLES[name])}")
+
+    def measure(self, name, backend, data, options):
+        """Операции кэша на одном бэкенде; лучший из прогонов по каждой операции"""
+        keys = list(data)
+        single = keys[:options['single']]
+        operations = {
+            'set_many': lambda: backend.set_many(data, 3600),
+            'get_many': lambda: backend.get_many(keys),
+            'get': lambda: [backend.get(key) for key in single],
+            'set': lambda: [backend.set(key, data[key], 3600) for key in single],
+            'add': lambda: [backend.add(f'{key}:lock', 1, 30) for key in single],
+            'delete_many': lambda: backend.delete_many(keys),
+        }
+
+        best = {}
+        table_size = None
+        for attempt in range(options['repeat']):
+            backend.clear()
+            runs = {}
+            for op, run in operations.items():
+                counter = QueryCounter()
+                started = time.perf_counter()
+                with connection.execute_wrapper(counter):
+                    run()
+                runs[op] = {'seconds': time.perf_counter() - started, 'queries': counter.count}
+                if op == 'set_many' and connection.vendor == 'postgresql':
+                    table_size = self.table_size(TABLES[name])
+            self.stdout.write(
+                f"  {name} #{attempt + 1}: "
+                + ' | '.join(f"{op} {run['seconds']:.3f}s/{run['queries']}" for op, run in runs.items())
+            )
+            for op, run in runs.items():
+                if op not in best or run['seconds'] < best[op]['seconds']:
+                    best[op] = run
+        best['table_size'] = table_size
+        return best
+
+    def table_size(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+            return cursor.fetchone()[0]
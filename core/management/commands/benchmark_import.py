@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.importer.copy_engine import CopyImportEngine
+from core.importer.engine import BulkImportEngine
+from core.importer.parser import parse_sheet
+from core.importer.synthetic import generate_workbook
+
+
+class BenchmarkRollback(Exception):
+    """Откат транзакции замера: данные в БД не сохраняются"""
+
+
+class Command(BaseCommand):
+    help = "Замер импорта на синтетических книгах разного размера: время, SQL запросы и память"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[500, 2000, 5000],
+            help='Размеры книг (количество студентов)',
+        )
+        parser.add_argument('--sessions', type=int, default=2, help='Количество сессий')
+        parser.add_argument('--courses', type=int, default=4, help='Количество предметов в сессии')
+        parser.add_argument('--types', type=int, default=3, help='Количество типов зачетов в предмете')
+        parser.add_argument('--repeat', type=int, default=3, help='Количество прогонов каждого движка')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пакета для ORM')
+        parser.add_argument(
+            '--engines',
+            nargs='+',
+            choices=['orm', 'copy'],
+            default=['orm', 'copy'],
+            help='Движки записи для сравнения (copy - только PostgreSQL)',
+        )
+        parser.add_argument('--workbook', type=str, help='Готовая книга вместо сгенерированных')
+        parser.add_argument('--report', type=str, help='Записать результаты в JSON файл')
+
+    def handle(self, *args, **options):
+        engines = {'orm': BulkImportEngine, 'copy': CopyImportEngine}
+        names = list(dict.fromkeys(options['engines']))
+        if 'copy' in names and connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING("⚠️ COPY доступен только для PostgreSQL - движок пропущен"))
+            names.remove('copy')
+        if not names:
+            raise CommandError("Нет доступных движков для замера")
+        if options['workbook'] and not os.path.exists(options['workbook']):
+            raise CommandError(f"Файл {options['workbook']} не найден")
+
+        results = []
+        tracemalloc.start()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                if options['workbook']:
+                    workbooks = [(None, options['workbook'])]
+                else:
+                    workbooks = [(size, os.path.join(directory, f'benchmark_{size}.xlsx')) for size in options['sizes']]
+
+                for size, path in workbooks:
+                    if size is not None:
+                        self.stdout.write(
+                            f"\n📝 Генерация книги: {size} студентов, {options['sessions']} сессий "
+                            f"по {options['courses']} предметов..."
+                        )
+                        generate_workbook(path, size, options['sessions'], options['courses'], options['types'])
+                    results.append(self.measure(path, size, names, engines, options))
+        finally:
+            tracemalloc.stop()
+
+        self.stdout.write('\n📊 Лучший результат по размерам:')
+        for result in results:
+            line = [f"  {result['students']:>7} студ. | разбор {result['parse']['seconds']:.2f}s"]
+            for name in names:
+                best = result['engines'][name]
+                line.append(
+                    f"{name}: {best['seconds']:.2f}s, SQL {best['queries']}, "
+                    f"{best['peak_memory'] / 1024 / 1024:.1f} МБ, {best['rows_per_sec']:.0f} строк/с"
+                )
+            self.stdout.write(' | '.join(line))
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as fh:
+                json.dump(results, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f"📊 Отчет записан в {options['report']}")
+
+    def measure(self, path, size, names, engines, options):
+        """Разбор книги и запись каждым движком; каждый прогон откатывается"""
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        parsed = parse_sheet(path)
+        parse = {
+            'seconds': time.perf_counter() - started,
+            'peak_memory': tracemalloc.get_traced_memory()[1] - baseline,
+        }
+        jobs = [(parsed['layout'], parsed['rows'])]
+        rows = len(parsed['rows'])
+        self.stdout.write(f"Строк студентов: {rows}, разбор: {parse['seconds']:.2f}s")
+
+        best = {}
+        for name in names:
+            for attempt in range(options['repeat']):
+                engine = engines[name](batch_size=options['batch_size'])
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                # Каждый прогон пишет в исходное состояние БД и откатывается
+                try:
+                    with transaction.atomic():
+                        stats = engine.run(jobs)
+                        raise BenchmarkRollback
+                except BenchmarkRollback:
+                    pass
+                run = {
+                    'seconds': stats['elapsed'],
+                    'queries': stats['queries'],
+                    'peak_memory': tracemalloc.get_traced_memory()[1] - baseline,
+                    'rows_per_sec': stats['rows_per_sec'],
+                    'assessments': stats['assessments_written'],
+                }
+                self.stdout.write(
+                    f"  {name} #{attempt + 1}: {run['seconds']:.2f}s | SQL: {run['queries']} | "
+                    f"память: {run['peak_memory'] / 1024 / 1024:.1f} МБ | {run['rows_per_sec']:.1f} строк/с"
+                )
+                if name not in best or run['seconds'] < best[name]['seconds']:
+                    best[name] = run
+
+        if 'orm' in best and 'copy' in best and best['copy']['seconds'] > 0:
+            speedup = best['orm']['seconds'] / best['copy']['seconds']
+            self.stdout.write(self.style.SUCCESS(f"✅ COPY быстрее ORM в {speedup:.1f} раза"))
+        return {'students': rows if size is None else size, 'parse': parse, 'engines': best}
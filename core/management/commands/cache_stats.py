@@ -0,0 +1,92 @@
+import json
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from core.cache.instrumented import InstrumentedCache, empty_metric
+from core.models import CacheMetric
+
+SORT_FIELDS = ('hits', 'misses', 'ratio', 'sets', 'reuse', 'set_bytes')
+
+
+class Command(BaseCommand):
+    help = "Статистика кэша по префиксам ключей, суммарно по всем воркерам"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sort',
+            choices=SORT_FIELDS,
+            default='hits',
+            help='Поле сортировки (по убыванию; ratio и reuse - по возрастанию)',
+        )
+        parser.add_argument('--limit', type=int, default=0, help='Показать только первые N префиксов')
+        parser.add_argument('--reset', action='store_true', help='Удалить накопленные счетчики')
+        parser.add_argument('--report', type=str, help='Записать статистику в JSON файл')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = CacheMetric.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'✅ Счетчики кэша удалены ({deleted} строк)'))
+            return
+
+        # Счетчики этого процесса (например, после monitor_performance)
+        default = caches['default']
+        if isinstance(default, InstrumentedCache):
+            default.flush()
+
+        rows = self.collect()
+        if not rows:
+            self.stdout.write(self.style.WARNING('⚠️ Счетчиков пока нет: воркеры сбрасывают их раз в FLUSH_INTERVAL'))
+            return
+
+        ascending = options['sort'] in ('ratio', 'reuse')
+        rows.sort(key=lambda row: row[options['sort']], reverse=not ascending)
+        if options['limit']:
+            rows = rows[:options['limit']]
+
+        self.stdout.write('🗄️ Кэш по префиксам ключей (все воркеры):\n')
+        self.stdout.write(
+            f"  {'префикс':<28} {'попад.':>9} {'промахи':>9} {'%':>5} {'записи':>8} "
+            f"{'чтений/зап.':>11} {'чтение мс':>9} {'запись мс':>9} {'удал. мс':>9} {'размер Б':>9}"
+        )
+        for row in rows:
+            line = (
+                f"  {row['prefix'][:28]:<28} {row['hits']:>9} {row['misses']:>9} {row['ratio']:>5.0f} "
+                f"{row['sets']:>8} {row['reuse']:>11.1f} {row['get_ms']:>9.2f} {row['set_ms']:>9.2f} "
+                f"{row['delete_ms']:>9.2f} {row['avg_bytes']:>9.0f}"
+            )
+            if row['sets'] and row['reuse'] < 1:
+                # Значение чаще пересчитывается, чем читается: TTL мал или ключ слишком узкий
+                self.stdout.write(self.style.WARNING(line + '  ⚠️ почти не переиспользуется'))
+            else:
+                self.stdout.write(line)
+
+        workers = CacheMetric.objects.aggregate(workers=Count('worker', distinct=True), updated=Max('updated_at'))
+        updated = timezone.localtime(workers['updated'])
+        self.stdout.write(f"\n  Воркеров: {workers['workers']}, последнее обновление: {updated:%d.%m.%Y %H:%M:%S}")
+
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as fh:
+                json.dump(rows, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f"📊 Отчет записан в {options['report']}")
+
+    def collect(self):
+        """Суммы счетчиков по префиксам и производные показатели"""
+        totals = CacheMetric.objects.values('prefix').annotate(
+            **{name: Sum(name) for name in empty_metric()}
+        )
+        rows = []
+        for row in totals:
+            reads = row['hits'] + row['misses']
+            rows.append({
+                **row,
+                'ratio': row['hits'] / reads * 100 if reads else 0.0,
+                'reuse': row['hits'] / row['sets'] if row['sets'] else float(row['hits']),
+                'get_ms': row['get_seconds'] / reads * 1000 if reads else 0.0,
+                'set_ms': row['set_seconds'] / row['sets'] * 1000 if row['sets'] else 0.0,
+                'delete_ms': row['delete_seconds'] / row['deletes'] * 1000 if row['deletes'] else 0.0,
+                'avg_bytes': row['set_bytes'] / row['sets'] if row['sets'] else 0.0,
+            })
+        return rows
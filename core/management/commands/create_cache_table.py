@@ -1,18 +1,39 @@
+from django.conf import settings
+from django.core.cache import caches
 from django.core.management.base import BaseCommand
 from django.core.management import call_command
 
+from core.cache.postgres import PostgresCache
+
 
 class Command(BaseCommand):
-    help = "Создание таблицы для кэширования в базе данных"
+    help = "Создание таблиц для кэширования в базе данных"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recreate',
+            action='store_true',
+            help='Пересоздать таблицы PostgresCache (все записи кэша будут удалены)',
+        )
 
     def handle(self, *args, **options):
-        """Создает таблицу cache_table для кэширования"""
+        """Создает таблицы всех кэшей в БД: DatabaseCache и PostgresCache"""
         try:
-            call_command('createcachetable', verbosity=2)
+            # Таблицы DatabaseCache (если такие кэши настроены)
+            call_command('createcachetable', verbosity=options['verbosity'])
+
+            for alias in settings.CACHES:
+                cache = caches[alias]
+                if not isinstance(cache, PostgresCache):
+                    continue
+                cache.create_table(drop=options['recreate'])
+                table = settings.CACHES[alias]['LOCATION']
+                self.stdout.write(f'🗄️ {alias}: UNLOGGED таблица {table} готова')
+
             self.stdout.write(
-                self.style.SUCCESS('✅ Таблица кэша успешно создана!')
+                self.style.SUCCESS('✅ Таблицы кэша успешно созданы!')
             )
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'❌ Ошибка создания таблицы кэша: {e}')
-            ) 
\ No newline at end of file
+            )
\ No newline at end of file
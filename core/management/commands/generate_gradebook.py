@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importer.synthetic import MAX_ASSESSMENT_TYPES, generate_workbook
+
+
+class Command(BaseCommand):
+    help = "Генерация синтетической книги успеваемости в формате import_data"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Путь к создаваемому файлу .xlsx')
+        parser.add_argument('--students', type=int, default=1000, help='Количество студентов')
+        parser.add_argument('--sessions', type=int, default=2, help='Количество сессий')
+        parser.add_argument('--courses', type=int, default=4, help='Количество предметов в сессии')
+        parser.add_argument(
+            '--types',
+            type=int,
+            default=3,
+            help=f'Количество типов зачетов в предмете (1-{MAX_ASSESSMENT_TYPES})',
+        )
+        parser.add_argument(
+            '--suspended',
+            type=int,
+            default=10,
+            help='Количество студентов в разделе "Приостановленное обучение"',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+
+    def handle(self, *args, **options):
+        if not options['path'].endswith('.xlsx'):
+            raise CommandError("Файл должен иметь расширение .xlsx")
+        try:
+            generate_workbook(
+                options['path'],
+                students=options['students'],
+                sessions=options['sessions'],
+                courses=options['courses'],
+                types=options['types'],
+                suspended=options['suspended'],
+                seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Книга {options['path']} создана: {options['students']} студентов "
+            f"(+{options['suspended']} приостановленных), {options['sessions']} сессий "
+            f"по {options['courses']} предметов, {options['types']} типов зачетов"
+        ))
@@ -20,6 +20,18 @@ class Command(BaseCommand):
             action='store_true', 
             help='Пропустить прогрев кэша',
         )
+        parser.add_argument(
+            '--warmup-budget',
+            type=float,
+            default=120,
+            help='Максимальное время прогрева кэша в секундах (по умолчанию 120)',
+        )
+        parser.add_argument(
+            '--warmup-batch-size',
+            type=int,
+            default=1000,
+            help='Количество ключей в одной записи set_many при прогреве (по умолчанию 1000)',
+        )
 
     def handle(self, *args, **options):
         """Полная инициализация системы"""
@@ -75,7 +87,7 @@ class Command(BaseCommand):
         # 2.5. Создание таблицы кэша
         self.stdout.write('\n🗄️ Создание таблицы кэша...')
         try:
-            call_command('createcachetable', verbosity=0)
+            call_command('create_cache_table', verbosity=0)
             self.stdout.write(self.style.SUCCESS('✅ Таблица кэша создана'))
         except Exception as e:
             self.stdout.write(self.style.WARNING(f'⚠️ Ошибка создания таблицы кэша: {e}'))
@@ -98,6 +110,14 @@ class Command(BaseCommand):
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'❌ Ошибка оптимизации БД: {e}'))
         
+        # 4.5. Пересчет агрегатов предметов и студентов
+        self.stdout.write('\n📊 Пересчет агрегатов предметов и студентов...')
+        try:
+            call_command('rebuild_aggregates', verbosity=0)
+            self.stdout.write(self.style.SUCCESS('✅ Агрегаты пересчитаны'))
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f'⚠️ Ошибка пересчета агрегатов: {e}'))
+        
         # 5. Очистка кэша
         self.stdout.write('\n🗄️ Очистка кэша...')
         try:
@@ -110,7 +130,7 @@ class Command(BaseCommand):
         if not options['skip_cache_warmup']:
             self.stdout.write('\n🔥 Прогрев кэша...')
             try:
-                self._warmup_cache()
+                self._warmup_cache(options['warmup_budget'], options['warmup_batch_size'])
                 self.stdout.write(self.style.SUCCESS('✅ Кэш прогрет'))
             except Exception as e:
                 self.stdout.write(self.style.WARNING(f'⚠️ Ошибка прогрева кэша: {e}'))
@@ -132,51 +152,85 @@ class Command(BaseCommand):
         )
         self.stdout.write('Система готова к работе! 🚀')
     
-    def _warmup_cache(self):
-        """Прогрев кэша наиболее используемых данных"""
+    def _warmup_cache(self, budget, batch_size):
+        """
+        Прогрев кэша админки: статистика студентов и агрегаты типов зачетов
+        (агрегаты предметов и студентов хранятся в таблицах CourseAggregate
+        и StudentAggregate).
+
+        Каждый агрегат считается одним групповым запросом и записывается
+        пачками через set_many в формате get_or_compute. Ключи (версии
+        пространств имен) берутся до расчета: если данные изменятся во
+        время прогрева, версия сбросится, и записанные значения не будут
+        прочитаны. По истечении budget секунд прогрев останавливается,
+        остальное досчитается при первом обращении.
+        """
         
-        from core.models import Student, Course, Assessment
+        from django.contrib import admin
+        from core.aggregates import assessment_type_counts
+        from core.cache.invalidation import AGGREGATE_TIMEOUT, ASSESSMENT_TYPE, STUDENT
+        from core.models import AssessmentType, Student
         
-        # Прогреваем кэш для первых 20 студентов
-        students = Student.objects.select_related('statistic')[:20]
-        for student in students:
-            try:
-                # Кэшируем статистику студента
-                cache_key = f"student_quick_stats_{student.id}"
-                if not cache.get(cache_key):
-                    # Запускаем метод который создаст кэш
-                    if hasattr(student, 'statistic'):
-                        pass  # Статистика уже загружена
-                
-                # Кэшируем средний балл
-                cache_key = f"student_avg_score_{student.id}"
-                if not cache.get(cache_key):
-                    scores = Assessment.objects.filter(
-                        enrollment__student=student, 
-                        is_final_grade=True
-                    ).values_list('score', flat=True)
-                    
-                    if scores:
-                        avg_score = sum(float(score) for score in scores) / len(scores)
-                        cache.set(cache_key, avg_score, 600)
-                        
-            except Exception:
-                pass  # Игнорируем ошибки прогрева
-        
-        # Прогреваем кэш для курсов
-        courses = Course.objects.all()[:20]
-        for course in courses:
-            try:
-                cache_key = f"course_students_{course.id}"
-                if not cache.get(cache_key):
-                    count = course.assessments.values('enrollment__student').distinct().count()
-                    cache.set(cache_key, count, 300)
-                    
-                cache_key = f"course_avg_{course.id}"
-                if not cache.get(cache_key):
-                    final_assessments = course.assessments.filter(is_final_grade=True)
-                    if final_assessments.exists():
-                        avg = sum(float(a.score) for a in final_assessments) / final_assessments.count()
-                        cache.set(cache_key, avg, 300)
-            except Exception:
-                pass
\ No newline at end of file
+        deadline = time.time() + budget
+        student_ids = list(Student.objects.values_list('id', flat=True))
+        type_ids = list(AssessmentType.objects.values_list('id', flat=True))
+        
+        def quick_stats(ids):
+            # HTML блока статистики рендерит сама админка студентов
+            student_admin = admin.site._registry[Student]
+            students = Student.objects.select_related('statistic').in_bulk(ids)
+            return {pk: student_admin.render_quick_stats(obj) for pk, obj in students.items()}
+        
+        # (название, префикс ключа, пространство имен, id объектов, расчет, расчет по пачкам).
+        # Групповой расчет возвращает значения сразу для всех объектов,
+        # расчет по пачкам (quick_stats) получает id очередной пачки
+        aggregates = [
+            ('Оценок по типам зачетов', 'assessment_type_count_', ASSESSMENT_TYPE, type_ids,
+             assessment_type_counts, False),
+            ('Статистика студентов', 'student_quick_stats_', STUDENT, student_ids, quick_stats, True),
+        ]
+        
+        total_written = 0
+        for title, prefix, namespace, ids, compute, per_batch in aggregates:
+            if time.time() >= deadline:
+                self.stdout.write(self.style.WARNING(f'⏱️ Бюджет времени исчерпан, пропущено: {title}'))
+                continue
+            written = self._warmup_aggregate(
+                title, prefix, namespace, ids, compute, per_batch, batch_size, deadline, AGGREGATE_TIMEOUT,
+            )
+            total_written += written
+        
+        self.stdout.write(f'   Записано значений: {total_written}')
+    
+    def _warmup_aggregate(self, title, prefix, namespace, ids, compute, per_batch, batch_size, deadline, timeout):
+        """Прогрев одного агрегата; возвращает количество записанных значений"""
+        
+        from core.cache.invalidation import versioned_keys
+        from core.cache.stampede import stored_timeout, wrap
+        
+        started = time.time()
+        batches = [ids[i:i + batch_size] for i in range(0, len(ids), batch_size)]
+        # Ключи всех пачек - до расчета, чтобы не записать значение по новой версии
+        keys = [versioned_keys(prefix, namespace, batch, bulk=True) for batch in batches]
+        values = None if per_batch else compute()
+        
+        written = 0
+        for batch, batch_keys in zip(batches, keys):
+            if time.time() >= deadline:
+                self.stdout.write(self.style.WARNING(
+                    f'   ⏱️ {title}: бюджет времени исчерпан на {written}/{len(ids)}'
+                ))
+                return written
+            batch_values = compute(batch) if per_batch else values
+            data = {}
+            for pk, key in batch_keys.items():
+                if per_batch and pk not in batch_values:
+                    continue  # объект удален во время прогрева
+                data[key] = wrap(batch_values.get(pk, 0), timeout)
+            cache.set_many(data, stored_timeout(timeout))
+            written += len(batch)
+            if len(batches) > 1:
+                self.stdout.write(f'   ⏳ {title}: {written}/{len(ids)}')
+        
+        self.stdout.write(f'   ✔ {title}: {written} за {time.time() - started:.2f} сек')
+        return written
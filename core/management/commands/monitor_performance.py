@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
+from django.core.management import call_command
 from django.db import connection
+from django.db.models import Count, Max, Sum
 from django.core.cache import cache
 from django.test import Client, override_settings
 from django.conf import settings
@@ -90,6 +92,30 @@ class Command(BaseCommand):
             else:
                 self.stdout.write(self.style.ERROR('  ❌ Кэш не работает'))
             
+            # Попадания по уровням двухуровневого кэша, суммарно по воркерам
+            if hasattr(cache, 'tier_stats'):
+                from core.models import CacheTierMetric
+
+                cache.flush_stats()
+                stats = CacheTierMetric.objects.aggregate(
+                    l1_hits=Sum('l1_hits'), l1_misses=Sum('l1_misses'),
+                    l2_hits=Sum('l2_hits'), l2_misses=Sum('l2_misses'),
+                    l1_size=Sum('l1_size'), workers=Count('id'), updated=Max('updated_at'),
+                )
+                for tier in ('l1', 'l2'):
+                    hits = stats[f'{tier}_hits'] or 0
+                    total = hits + (stats[f'{tier}_misses'] or 0)
+                    ratio = hits / total * 100 if total else 0
+                    self.stdout.write(f'  {tier.upper()}: попаданий {hits} из {total} ({ratio:.0f}%)')
+                self.stdout.write(
+                    f"  L1 записей: {stats['l1_size'] or 0} (до {cache.tier_stats()['l1_max_entries']} "
+                    f"на воркер), воркеров: {stats['workers']}"
+                )
+            
+            # Попадания по префиксам ключей, суммарно по воркерам
+            self.stdout.write('')
+            call_command('cache_stats', limit=10, stdout=self.stdout)
+            
             # Проверка базы данных
             self.stdout.write('\n🗃️  Проверка базы данных...')
             try:
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.aggregates import refresh_course_aggregates, refresh_student_aggregates
+
+# Таблицы агрегатов: {имя: (название, функция пересчета)}
+AGGREGATES = {
+    'courses': ('Агрегаты предметов', refresh_course_aggregates),
+    'students': ('Агрегаты студентов', refresh_student_aggregates),
+}
+
+
+class Command(BaseCommand):
+    help = "Полный пересчет таблиц агрегатов (CourseAggregate, StudentAggregate)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            choices=list(AGGREGATES),
+            nargs='+',
+            default=list(AGGREGATES),
+            help='Пересчитать только указанные таблицы',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном upsert (по умолчанию 1000)',
+        )
+
+    def handle(self, *args, **options):
+        """Пересчитывает агрегаты групповыми запросами, каждую таблицу - в одной транзакции"""
+        for name in options['only']:
+            title, refresh = AGGREGATES[name]
+            started = time.monotonic()
+            with transaction.atomic():
+                # Строки объектов без оценок и сертификатов тоже перезаписываются (нулями)
+                written = refresh(batch_size=options['batch_size'])
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'✅ {title} пересчитаны: {written} строк за {time.monotonic() - started:.2f} сек'
+                )
+            )
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-16 23:01
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Удаляет дубликаты перед созданием уникальных ограничений.
+    Оставляем самую раннюю запись (ее и возвращал get_or_create при импорте).
+    """
+    Assessment = apps.get_model('core', 'Assessment')
+    Attendance = apps.get_model('core', 'Attendance')
+    Certificate = apps.get_model('core', 'Certificate')
+
+    duplicates = (Assessment.objects.values('enrollment', 'course', 'type')
+                  .annotate(keep_id=Min('id'), total=Count('id'))
+                  .filter(total__gt=1))
+    for group in duplicates:
+        extra = Assessment.objects.filter(
+            enrollment=group['enrollment'], course=group['course'], type=group['type']
+        ).exclude(id=group['keep_id'])
+        # Сертификаты ссылаются на оценку с CASCADE - переносим их на оставшуюся запись
+        Certificate.objects.filter(assessment__in=extra).update(assessment_id=group['keep_id'])
+        extra.delete()
+
+    duplicates = (Attendance.objects.values('enrollment', 'session')
+                  .annotate(keep_id=Min('id'), total=Count('id'))
+                  .filter(total__gt=1))
+    for group in duplicates:
+        Attendance.objects.filter(
+            enrollment=group['enrollment'], session=group['session']
+        ).exclude(id=group['keep_id']).delete()
+
+    duplicates = (Certificate.objects.values('student', 'course')
+                  .annotate(keep_id=Min('id'), total=Count('id'))
+                  .filter(total__gt=1))
+    for group in duplicates:
+        Certificate.objects.filter(
+            student=group['student'], course=group['course']
+        ).exclude(id=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_alter_assessment_certificate_issued_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='assessment',
+            constraint=models.UniqueConstraint(fields=('enrollment', 'course', 'type'), name='unique_assessment'),
+        ),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('enrollment', 'session'), name='unique_attendance'),
+        ),
+        migrations.AddConstraint(
+            model_name='certificate',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='unique_certificate'),
+        ),
+    ]
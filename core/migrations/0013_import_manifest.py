@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-16 23:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_unique_import_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=255, verbose_name='Источник (книга:лист)')),
+                ('row_key', models.CharField(max_length=255, verbose_name='Ключ строки')),
+                ('content_hash', models.CharField(max_length=64, verbose_name='Хэш содержимого')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Дата импорта')),
+            ],
+            options={
+                'verbose_name': 'Строка импорта',
+                'verbose_name_plural': 'Манифест импорта',
+                'constraints': [models.UniqueConstraint(fields=('source', 'row_key'), name='unique_import_manifest_row')],
+            },
+        ),
+    ]
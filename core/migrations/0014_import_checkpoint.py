@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-16 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_import_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('run_key', models.CharField(max_length=64, unique=True, verbose_name='Ключ загрузки')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='Размер порции')),
+                ('total_rows', models.PositiveIntegerField(verbose_name='Всего строк')),
+                ('rows_done', models.PositiveIntegerField(default=0, verbose_name='Записано строк')),
+                ('chunks_done', models.PositiveIntegerField(default=0, verbose_name='Записано порций')),
+                ('completed', models.BooleanField(default=False, verbose_name='Завершен')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='Начало')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+                'verbose_name_plural': 'Контрольные точки импорта',
+            },
+        ),
+    ]
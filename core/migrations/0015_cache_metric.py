@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-16 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(max_length=100, verbose_name='Воркер (хост:pid:запуск)')),
+                ('prefix', models.CharField(max_length=100, verbose_name='Префикс ключа')),
+                ('hits', models.BigIntegerField(default=0, verbose_name='Попадания')),
+                ('misses', models.BigIntegerField(default=0, verbose_name='Промахи')),
+                ('sets', models.BigIntegerField(default=0, verbose_name='Записи')),
+                ('deletes', models.BigIntegerField(default=0, verbose_name='Удаления')),
+                ('get_seconds', models.FloatField(default=0, verbose_name='Время чтения, с')),
+                ('set_seconds', models.FloatField(default=0, verbose_name='Время записи, с')),
+                ('set_bytes', models.BigIntegerField(default=0, verbose_name='Объем записанных значений, байт')),
+                ('updated_at', models.DateTimeField(verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Метрика кэша',
+                'verbose_name_plural': 'Метрики кэша',
+                'constraints': [models.UniqueConstraint(fields=('worker', 'prefix'), name='unique_cache_metric_worker_prefix')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-16 23:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_cache_metric'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseAggregate',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregate', serialize=False, to='core.course', verbose_name='Предмет')),
+                ('final_count', models.PositiveIntegerField(default=0, verbose_name='Итоговых оценок')),
+                ('final_sum', models.DecimalField(decimal_places=1, default=0, max_digits=14, verbose_name='Сумма итоговых оценок')),
+                ('avg_score', models.FloatField(default=0, verbose_name='Средний итоговый балл')),
+                ('students_count', models.PositiveIntegerField(default=0, verbose_name='Студентов с оценками')),
+                ('certificates_unready', models.PositiveIntegerField(default=0, verbose_name='Сертификатов: не выдан')),
+                ('certificates_conditionally', models.PositiveIntegerField(default=0, verbose_name='Сертификатов: условно')),
+                ('certificates_control_received', models.PositiveIntegerField(default=0, verbose_name='Сертификатов: поступила контрольная')),
+                ('certificates_in_progress', models.PositiveIntegerField(default=0, verbose_name='Сертификатов: готовится')),
+                ('certificates_completed', models.PositiveIntegerField(default=0, verbose_name='Сертификатов: готов')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Агрегаты предмета',
+                'verbose_name_plural': 'Агрегаты предметов',
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-16 23:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_course_aggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentAggregate',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='aggregate', serialize=False, to='core.student', verbose_name='Студент')),
+                ('sessions_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Сессий')),
+                ('certificates_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Сертификатов')),
+                ('final_count', models.PositiveIntegerField(default=0, verbose_name='Итоговых оценок')),
+                ('final_sum', models.DecimalField(decimal_places=1, default=0, max_digits=14, verbose_name='Сумма итоговых оценок')),
+                ('avg_score', models.FloatField(db_index=True, default=0, verbose_name='Средний итоговый балл')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Агрегаты студента',
+                'verbose_name_plural': 'Агрегаты студентов',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-16 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_student_aggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['-date', '-id'], name='assessment_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='assessment',
+            index=models.Index(fields=['course', '-date', '-id'], name='assessment_course_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['session', '-id'], name='attendance_session_id_idx'),
+        ),
+    ]
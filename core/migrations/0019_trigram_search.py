@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-16 23:50
+
+from django.db import migrations
+
+# GIN индексы pg_trgm для поиска в админке: (имя индекса, таблица, колонка).
+# Поиск icontains в PostgreSQL компилируется в UPPER("колонка"::text) LIKE
+# UPPER('%...%') - индекс построен ровно по этому выражению.
+TRIGRAM_INDEXES = [
+    ('student_full_name_trgm_idx', 'core_student', 'full_name'),
+    ('student_email_trgm_idx', 'core_student', 'email'),
+    ('course_title_trgm_idx', 'core_course', 'title'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """Расширение pg_trgm и индексы; на других СУБД - ничего"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" '
+            f'USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    # Расширение не удаляем: им могут пользоваться другие объекты БД
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
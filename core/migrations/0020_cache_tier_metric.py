@@ -0,0 +1,30 @@
+# Generated by Django 5.2 on 2026-10-16 23:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_trigram_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheTierMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker', models.CharField(max_length=100, unique=True, verbose_name='Воркер (хост:pid:запуск)')),
+                ('l1_hits', models.BigIntegerField(default=0, verbose_name='Попадания L1')),
+                ('l1_misses', models.BigIntegerField(default=0, verbose_name='Промахи L1')),
+                ('l2_hits', models.BigIntegerField(default=0, verbose_name='Попадания L2')),
+                ('l2_misses', models.BigIntegerField(default=0, verbose_name='Промахи L2')),
+                ('l1_size', models.PositiveIntegerField(default=0, verbose_name='Записей в L1')),
+                ('updated_at', models.DateTimeField(verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Метрика уровней кэша',
+                'verbose_name_plural': 'Метрики уровней кэша',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_cache_tier_metric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cachemetric',
+            name='delete_seconds',
+            field=models.FloatField(default=0, verbose_name='Время удаления, с'),
+        ),
+    ]
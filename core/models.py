@@ -1,6 +1,8 @@
 from django.db import models
 from django.utils.timezone import now
 
+from core.cache.registry import assessment_types, sessions
+
 
 class Session(models.Model):
     """ Модель для сессии """
@@ -51,7 +53,7 @@ class Course(models.Model):
     session = models.ForeignKey(Session, on_delete=models.CASCADE, related_name="courses", verbose_name="Сессия")
 
     def __str__(self):
-        return f"Курс: {self.title} (сессия {self.session.session_number})"
+        return f"Курс: {self.title} (сессия {sessions.get(self.session_id).session_number})"
     
 class Enrollment(models.Model):
     """ Запись о зачислении студента на сессию """
@@ -77,7 +79,7 @@ class Enrollment(models.Model):
                               max_length=20, verbose_name="Статус")
 
     def __str__(self):
-        return f"Запись о зачислении для {self.student.full_name} (сессия {self.session.session_number})"
+        return f"Запись о зачислении для {self.student.full_name} (сессия {sessions.get(self.session_id).session_number})"
 
 class Attendance(models.Model):
     """ Посещаемость: присутствие/отсутствие студента на конкретной сессии. """
@@ -85,13 +87,21 @@ class Attendance(models.Model):
     class Meta:
         verbose_name = "Посещаемость"
         verbose_name_plural = "Записи о посещаемости"
+        constraints = [
+            models.UniqueConstraint(fields=["enrollment", "session"], name="unique_attendance")
+        ]
+        indexes = [
+            # Список в админке: фильтр по сессии, листание по курсору (-id)
+            models.Index(fields=["session", "-id"], name="attendance_session_id_idx"),
+        ]
 
     enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name="attendances")
     session = models.ForeignKey(Session, on_delete=models.CASCADE)
     present = models.BooleanField("Присутствовал")  # Был ли студент на данной сессии
 
     def __str__(self):
-        return f"Посещаемость для {self.enrollment.student.full_name} (сессия №{self.session.session_number})"
+        session = sessions.get(self.session_id)
+        return f"Посещаемость для {self.enrollment.student.full_name} (сессия №{session.session_number})"
 
 class AssessmentType(models.Model):
     """ Тип зачета (Контрольная, чтение книг) """
@@ -117,6 +127,14 @@ class Assessment(models.Model):
         verbose_name = "Оценка"
         verbose_name_plural = "Оценки"
         ordering = ["-date"]
+        constraints = [
+            models.UniqueConstraint(fields=["enrollment", "course", "type"], name="unique_assessment")
+        ]
+        indexes = [
+            # Сортировка списка (-date, -id): листание по курсору в админке
+            models.Index(fields=["-date", "-id"], name="assessment_date_id_idx"),
+            models.Index(fields=["course", "-date", "-id"], name="assessment_course_date_id_idx"),
+        ]
     
     enrollment = models.ForeignKey(Enrollment, on_delete=models.CASCADE, related_name="assessments", verbose_name="Зачисление")
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="assessments", verbose_name="Предмет")
@@ -127,7 +145,7 @@ class Assessment(models.Model):
     is_final_grade = models.BooleanField(default=False, verbose_name="Итоговая оценка за предмет")
 
     def __str__(self):
-        grade_type = "Итоговая оценка" if self.is_final_grade else f"Оценка по {self.type.name}"
+        grade_type = "Итоговая оценка" if self.is_final_grade else f"Оценка по {assessment_types.get(self.type_id).name}"
         return f"{grade_type} {self.score} для {self.enrollment.student.full_name} по {self.course.title}"
 
 class Certificate(models.Model):
@@ -139,6 +157,9 @@ class Certificate(models.Model):
         verbose_name = "Сертификат"
         verbose_name_plural = "Сертификаты"
         ordering = ["-issued_on"]
+        constraints = [
+            models.UniqueConstraint(fields=["student", "course"], name="unique_certificate")
+        ]
 
     class Status(models.TextChoices):
         UNREADY = "unready", "Не выдан"
@@ -179,3 +200,149 @@ class Statistic(models.Model):
 
     def __str__(self):
         return f"Статистика для {self.student.full_name}"
+
+class ImportManifest(models.Model):
+    """ 
+    Отпечаток строки студента из импортированной книги: источник (книга и лист),
+    ключ строки и хэш ее содержимого. Нужен для инкрементального импорта.
+    """
+
+    class Meta:
+        verbose_name = "Строка импорта"
+        verbose_name_plural = "Манифест импорта"
+        constraints = [
+            models.UniqueConstraint(fields=["source", "row_key"], name="unique_import_manifest_row")
+        ]
+
+    source = models.CharField("Источник (книга:лист)", max_length=255)
+    row_key = models.CharField("Ключ строки", max_length=255)
+    content_hash = models.CharField("Хэш содержимого", max_length=64)
+    imported_at = models.DateTimeField("Дата импорта", auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.row_key}"
+
+class ImportCheckpoint(models.Model):
+    """ 
+    Прогресс импорта порциями: сколько порций студентов уже зафиксировано.
+    Позволяет продолжить прерванный импорт с последней записанной порции.
+    """
+
+    class Meta:
+        verbose_name = "Контрольная точка импорта"
+        verbose_name_plural = "Контрольные точки импорта"
+
+    run_key = models.CharField("Ключ загрузки", max_length=64, unique=True)
+    chunk_size = models.PositiveIntegerField("Размер порции")
+    total_rows = models.PositiveIntegerField("Всего строк")
+    rows_done = models.PositiveIntegerField("Записано строк", default=0)
+    chunks_done = models.PositiveIntegerField("Записано порций", default=0)
+    completed = models.BooleanField("Завершен", default=False)
+    started_at = models.DateTimeField("Начало", auto_now_add=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    def __str__(self):
+        return f"{self.run_key[:12]}: {self.rows_done}/{self.total_rows}"
+
+class CacheMetric(models.Model):
+    """ 
+    Счетчики кэша по префиксу ключа в одном воркере: попадания, промахи,
+    записи, время операций и размер значений. Итог по всем воркерам -
+    сумма строк (команда cache_stats).
+    """
+
+    class Meta:
+        verbose_name = "Метрика кэша"
+        verbose_name_plural = "Метрики кэша"
+        constraints = [
+            models.UniqueConstraint(fields=["worker", "prefix"], name="unique_cache_metric_worker_prefix")
+        ]
+
+    worker = models.CharField("Воркер (хост:pid:запуск)", max_length=100)
+    prefix = models.CharField("Префикс ключа", max_length=100)
+    hits = models.BigIntegerField("Попадания", default=0)
+    misses = models.BigIntegerField("Промахи", default=0)
+    sets = models.BigIntegerField("Записи", default=0)
+    deletes = models.BigIntegerField("Удаления", default=0)
+    get_seconds = models.FloatField("Время чтения, с", default=0)
+    set_seconds = models.FloatField("Время записи, с", default=0)
+    delete_seconds = models.FloatField("Время удаления, с", default=0)
+    set_bytes = models.BigIntegerField("Объем записанных значений, байт", default=0)
+    updated_at = models.DateTimeField("Обновлено")
+
+    def __str__(self):
+        return f"{self.prefix} ({self.worker})"
+
+class CacheTierMetric(models.Model):
+    """ 
+    Счетчики уровней двухуровневого кэша (core/cache/tiered.py) в одном
+    воркере: попадания и промахи L1 и L2, размер L1. Итог по всем воркерам -
+    сумма строк (команда monitor_performance).
+    """
+
+    class Meta:
+        verbose_name = "Метрика уровней кэша"
+        verbose_name_plural = "Метрики уровней кэша"
+
+    worker = models.CharField("Воркер (хост:pid:запуск)", max_length=100, unique=True)
+    l1_hits = models.BigIntegerField("Попадания L1", default=0)
+    l1_misses = models.BigIntegerField("Промахи L1", default=0)
+    l2_hits = models.BigIntegerField("Попадания L2", default=0)
+    l2_misses = models.BigIntegerField("Промахи L2", default=0)
+    l1_size = models.PositiveIntegerField("Записей в L1", default=0)
+    updated_at = models.DateTimeField("Обновлено")
+
+    def __str__(self):
+        return self.worker
+
+class CourseAggregate(models.Model):
+    """ 
+    Агрегаты предмета для списка предметов в админке: итоговые оценки,
+    количество студентов и сертификаты по статусам. Пересчитывается после
+    изменения оценок и сертификатов (core/aggregates.py), полностью -
+    командой rebuild_aggregates.
+    """
+
+    class Meta:
+        verbose_name = "Агрегаты предмета"
+        verbose_name_plural = "Агрегаты предметов"
+
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True,
+                                  related_name="aggregate", verbose_name="Предмет")
+    final_count = models.PositiveIntegerField("Итоговых оценок", default=0)
+    final_sum = models.DecimalField("Сумма итоговых оценок", max_digits=14, decimal_places=1, default=0)
+    avg_score = models.FloatField("Средний итоговый балл", default=0)
+    students_count = models.PositiveIntegerField("Студентов с оценками", default=0)
+    certificates_unready = models.PositiveIntegerField("Сертификатов: не выдан", default=0)
+    certificates_conditionally = models.PositiveIntegerField("Сертификатов: условно", default=0)
+    certificates_control_received = models.PositiveIntegerField("Сертификатов: поступила контрольная", default=0)
+    certificates_in_progress = models.PositiveIntegerField("Сертификатов: готовится", default=0)
+    certificates_completed = models.PositiveIntegerField("Сертификатов: готов", default=0)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    def __str__(self):
+        return f"Агрегаты предмета №{self.course_id}"
+
+class StudentAggregate(models.Model):
+    """
+    Счетчики студента для списка студентов в админке: сессии, сертификаты
+    и средний итоговый балл. Пересчитывается после изменения зачислений,
+    оценок и сертификатов (core/aggregates.py), полностью - командой
+    rebuild_aggregates.
+    """
+
+    class Meta:
+        verbose_name = "Агрегаты студента"
+        verbose_name_plural = "Агрегаты студентов"
+
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True,
+                                   related_name="aggregate", verbose_name="Студент")
+    sessions_count = models.PositiveIntegerField("Сессий", default=0, db_index=True)
+    certificates_count = models.PositiveIntegerField("Сертификатов", default=0, db_index=True)
+    final_count = models.PositiveIntegerField("Итоговых оценок", default=0)
+    final_sum = models.DecimalField("Сумма итоговых оценок", max_digits=14, decimal_places=1, default=0)
+    avg_score = models.FloatField("Средний итоговый балл", default=0, db_index=True)
+    updated_at = models.DateTimeField("Обновлено", auto_now=True)
+
+    def __str__(self):
+        return f"Агрегаты студента №{self.student_id}"
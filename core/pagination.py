@@ -0,0 +1,292 @@
+"""
+Пагинатор больших списков админки с оценочным количеством строк.
+
+Точный COUNT(*) по оценкам или посещаемости с фильтрами и JOIN бывает
+дольше выборки самой страницы. EstimatedCountPaginator для PostgreSQL:
+
+- без фильтров берет оценку планировщика из pg_class.reltuples;
+- с фильтрами - оценку строк из EXPLAIN запроса;
+- если оценка меньше ESTIMATE_THRESHOLD, считает точно (это дешево);
+- иначе пробует точный COUNT с ограничением COUNT_TIMEOUT_MS и кэширует
+  результат на COUNT_CACHE_TIMEOUT секунд; не успел - остается оценка
+  (тоже кэшируется, чтобы не повторять медленный подсчет на каждой странице).
+
+Оценочное количество отмечено флагом estimated, шаблоны админки
+(templates/admin/pagination.html, search_form.html) показывают его как ≈N.
+На других СУБД - обычный точный подсчет.
+
+Подключение: paginator = EstimatedCountPaginator и
+show_full_result_count = False (иначе админка отдельно считает всю таблицу).
+
+KeysetChangeList - постраничный вывод по курсору (seek) вместо OFFSET:
+страница после курсора выбирается условием по ключу сортировки и id
+(WHERE date <= x AND (date < x OR (date = x AND id < y))). Граница по
+первой колонке позволяет начать чтение составного индекса в порядке
+сортировки прямо с курсора, поэтому глубокая страница стоит столько же,
+сколько первая.
+Навигация - первая/предыдущая/следующая/последняя страница; номера
+страниц не используются. Подключается через OptimizedMixin.keyset_pagination.
+Сортировка по связанным полям и выражениям выводится обычным OFFSET.
+"""
+import base64
+import hashlib
+import json
+from functools import reduce
+
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+
+# Ниже этой оценки строки считаются точно и без ограничения времени
+ESTIMATE_THRESHOLD = 10000
+
+# Ограничение точного подсчета больших выборок (миллисекунды)
+COUNT_TIMEOUT_MS = 200
+
+# Сколько хранится результат подсчета (секунды)
+COUNT_CACHE_TIMEOUT = 60
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который для больших выборок PostgreSQL может вернуть оценку количества"""
+
+    estimated = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        using = queryset.db
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            return super().count
+
+        # Для оценки и подсчета JOIN из select_related и сортировка не нужны
+        queryset = queryset.select_related(None).order_by()
+        if not queryset.query.where and not queryset.query.distinct:
+            estimate = self.table_estimate(connection, queryset.model._meta.db_table)
+        else:
+            estimate = self.plan_estimate(connection, queryset)
+        if estimate < ESTIMATE_THRESHOLD:
+            return queryset.count()
+
+        key = self.cache_key(queryset)
+        cached = cache.get(key)
+        if cached is None:
+            cached = self.timed_count(using, queryset, estimate)
+            cache.set(key, cached, COUNT_CACHE_TIMEOUT)
+        count, self.estimated = cached
+        return count
+
+    def table_estimate(self, connection, table):
+        """Оценка строк таблицы по статистике (-1, если таблица еще не анализировалась)"""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+        return row[0] if row and row[0] >= 0 else 0
+
+    def plan_estimate(self, connection, queryset):
+        """Оценка строк запроса из плана EXPLAIN"""
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def timed_count(self, using, queryset, estimate):
+        """(количество, оценка ли это): точный COUNT, если успел за COUNT_TIMEOUT_MS"""
+        try:
+            # Точка сохранения: отмена запроса не ломает транзакцию запроса админки
+            with transaction.atomic(using=using):
+                with connections[using].cursor() as cursor:
+                    cursor.execute("SELECT current_setting('statement_timeout')")
+                    previous = cursor.fetchone()[0]
+                    cursor.execute("SET LOCAL statement_timeout = %s", [COUNT_TIMEOUT_MS])
+                    count = queryset.count()
+                    # SET LOCAL действует до конца внешней транзакции, если она есть
+                    cursor.execute("SELECT set_config('statement_timeout', %s, true)", [previous])
+            return count, False
+        except DatabaseError:
+            return estimate, True
+
+    def cache_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        digest = hashlib.md5(f"{sql}|{params!r}".encode()).hexdigest()[:15]
+        # Число в ключе - чтобы префикс счетчиков кэша был общим (admin_count_)
+        return f"admin_count_{int(digest, 16)}"
+
+    def validate_number(self, number):
+        # Флаг estimated выставляется при подсчете
+        if self.count is not None and not self.estimated:
+            return super().validate_number(number)
+        # Количество страниц приблизительное: номер за оценкой не ошибка
+        try:
+            return max(int(number), 1)
+        except (TypeError, ValueError):
+            return 1
+
+    def page(self, number):
+        if self.count is not None and not self.estimated:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+
+# Параметр строки запроса с курсором страницы
+CURSOR_VAR = 'cursor'
+
+
+def keyset_fields(model, ordering):
+    """
+    Поля сортировки [(поле, по убыванию)] для постраничного вывода по курсору
+    или None, если сортировка не подходит: только собственные поля модели,
+    последнее - уникальное и не NULL (обычно id).
+    """
+    fields = []
+    for item in ordering:
+        if not isinstance(item, str) or item == '?':
+            return None
+        descending = item.startswith('-')
+        name = item.lstrip('-')
+        if name == 'pk':
+            name = model._meta.pk.name
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if not field.concrete or field.is_relation:
+            return None
+        fields.append((field, descending))
+    if not fields or not (fields[-1][0].unique and not fields[-1][0].null):
+        return None
+    return fields
+
+
+def seek_filter(fields, values, forward=True):
+    """
+    Условие "строго после курсора" для сортировки fields (NULL - как
+    наибольшее значение, как в PostgreSQL); forward=False - "строго до".
+    Ветви условия объединены через OR, поэтому к ним добавляется избыточная
+    граница по первой колонке - по ней индекс начинает чтение с курсора.
+    """
+    branches = []
+    equal = Q()
+    for (field, descending), value in zip(fields, values):
+        name = field.name
+        if descending == forward:
+            # Дальше по порядку - меньшие значения; NULL стоит первым
+            after = Q(**{f'{name}__isnull': False}) if value is None else Q(**{f'{name}__lt': value})
+        elif value is None:
+            after = None
+        else:
+            after = Q(**{f'{name}__gt': value})
+            if field.null:
+                after |= Q(**{f'{name}__isnull': True})
+        if after is not None:
+            branches.append(equal & after)
+        equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+    if not branches:
+        return None
+    condition = reduce(lambda left, right: left | right, branches)
+
+    (field, descending), value = fields[0], values[0]
+    if value is None:
+        return condition
+    if descending == forward:
+        bound = Q(**{f'{field.name}__lte': value})
+    else:
+        bound = Q(**{f'{field.name}__gte': value})
+        if field.null:
+            bound |= Q(**{f'{field.name}__isnull': True})
+    return bound & condition
+
+
+class KeysetChangeList(ChangeList):
+    """Список админки с навигацией по курсору (ключ сортировки, id)"""
+
+    def __init__(self, request, *args, **kwargs):
+        # Курсор - не фильтр: убираем его до разбора параметров списка
+        request.GET = request.GET.copy()
+        self.cursor = request.GET.pop(CURSOR_VAR, [None])[-1]
+        self.keyset = None
+        self.keyset_links = None
+        super().__init__(request, *args, **kwargs)
+
+    def get_ordering(self, request, queryset):
+        ordering = super().get_ordering(request, queryset)
+        self.keyset = keyset_fields(self.model, ordering)
+        if self.keyset is None:
+            return ordering
+        # Явное положение NULL: одинаковый порядок во всех СУБД и в обе стороны
+        return [
+            F(field.name).desc(nulls_first=True) if descending else F(field.name).asc(nulls_last=True)
+            for field, descending in self.keyset
+        ]
+
+    def get_results(self, request):
+        super().get_results(request)
+        if self.keyset is None or not self.multi_page or (self.show_all and self.can_show_all):
+            return
+
+        direction, values = self.decode_cursor(self.cursor)
+        per_page = self.list_per_page
+        queryset = self.queryset
+        if direction in ('prev', 'last'):
+            # Предыдущая страница - первые per_page строк в обратном порядке
+            backwards = queryset.reverse()
+            if values is not None:
+                backwards = backwards.filter(seek_filter(self.keyset, values, forward=False) or Q(pk__in=[]))
+            pks = list(backwards.values_list('pk', flat=True)[:per_page])
+            if direction == 'prev' and len(pks) < per_page:
+                direction = None
+                page = queryset[:per_page]
+            else:
+                page = queryset.filter(pk__in=pks)
+        elif direction == 'next':
+            page = queryset.filter(seek_filter(self.keyset, values) or Q(pk__in=[]))[:per_page]
+        else:
+            page = queryset[:per_page]
+
+        rows = list(page)
+        self.result_list = page
+        at_start = direction is None
+        at_end = direction == 'last' or (direction in (None, 'next') and len(rows) < per_page)
+        self.keyset_links = [
+            ('« Первая', None if at_start else self.get_query_string(remove=[CURSOR_VAR, PAGE_VAR])),
+            ('‹ Назад', None if at_start or not rows else self.cursor_url('prev', rows[0])),
+            ('Вперед ›', None if at_end or not rows else self.cursor_url('next', rows[-1])),
+            ('Последняя »', None if at_end else self.get_query_string({CURSOR_VAR: 'last'}, [PAGE_VAR])),
+        ]
+
+    def cursor_url(self, direction, obj):
+        values = [getattr(obj, field.attname) for field, _ in self.keyset]
+        payload = json.dumps([direction, values], cls=DjangoJSONEncoder, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return self.get_query_string({CURSOR_VAR: cursor}, [PAGE_VAR])
+
+    def decode_cursor(self, cursor):
+        """(направление, значения полей) из параметра курсора; (None, None) - первая страница"""
+        if not cursor:
+            return None, None
+        if cursor == 'last':
+            return 'last', None
+        try:
+            payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(payload)
+            if direction not in ('next', 'prev') or len(values) != len(self.keyset):
+                raise ValueError(cursor)
+            values = [
+                None if value is None else field.to_python(value)
+                for (field, _), value in zip(self.keyset, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            raise IncorrectLookupParameters(f"Некорректный курсор: {cursor}")
+        return direction, values
@@ -0,0 +1,72 @@
+"""
+Сигналы моделей: инвалидация кэша агрегатов админки и справочников,
+пересчет агрегатов предметов и студентов (CourseAggregate, StudentAggregate).
+
+Каждый обработчик только запоминает затронутые объекты; сама
+инвалидация выполняется один раз после фиксации транзакции
+(см. core/cache/invalidation.py и core/cache/registry.py).
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.aggregates import refresh_on_commit
+from core.cache.invalidation import invalidate_on_commit
+from core.cache.registry import assessment_types, sessions
+from core.models import Assessment, AssessmentType, Certificate, Course, Enrollment, Session, Statistic, Student
+
+
+@receiver([post_save, post_delete], sender=Assessment)
+def assessment_changed(sender, instance, **kwargs):
+    invalidate_on_commit(
+        enrollments=[instance.enrollment_id],
+        courses=[instance.course_id],
+        assessment_types=[instance.type_id],
+    )
+    refresh_on_commit(courses=[instance.course_id], enrollments=[instance.enrollment_id])
+
+
+@receiver([post_save, post_delete], sender=Enrollment)
+def enrollment_changed(sender, instance, **kwargs):
+    invalidate_on_commit(students=[instance.student_id], sessions=[instance.session_id])
+    refresh_on_commit(students=[instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Certificate)
+def certificate_changed(sender, instance, **kwargs):
+    invalidate_on_commit(students=[instance.student_id], courses=[instance.course_id])
+    refresh_on_commit(courses=[instance.course_id], students=[instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Statistic)
+def statistic_changed(sender, instance, **kwargs):
+    invalidate_on_commit(students=[instance.student_id])
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    # ФИО входит в HTML быстрой статистики
+    invalidate_on_commit(students=[instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Session)
+def session_changed(sender, instance, **kwargs):
+    sessions.invalidate_on_commit()
+
+
+@receiver([post_save, post_delete], sender=AssessmentType)
+def assessment_type_changed(sender, instance, **kwargs):
+    assessment_types.invalidate_on_commit()
+
+
+@receiver(post_save, sender=Course)
+def course_created(sender, instance, created, **kwargs):
+    # Строка агрегатов для нового предмета (нулевая)
+    if created:
+        refresh_on_commit(courses=[instance.pk])
+
+
+@receiver(post_save, sender=Student)
+def student_created(sender, instance, created, **kwargs):
+    # Строка счетчиков для нового студента (нулевая)
+    if created:
+        refresh_on_commit(students=[instance.pk])
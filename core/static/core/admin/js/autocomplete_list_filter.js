@@ -0,0 +1,30 @@
+'use strict';
+// Фильтр списка с автодополнением (core/admin.py, AutocompleteListFilter):
+// варианты подгружаются из choices/ админки связанной модели, выбор
+// значения открывает список с этим фильтром.
+{
+    const $ = django.jQuery;
+
+    $(function() {
+        $('select.admin-autocomplete-filter').each(function(i, element) {
+            const select = $(element);
+            select.select2({
+                ajax: {
+                    url: element.dataset.choicesUrl,
+                    dataType: 'json',
+                    delay: 250,
+                    cache: true,
+                    data: (params) => ({term: params.term, page: params.page})
+                },
+                allowClear: true,
+                placeholder: element.dataset.placeholder,
+                width: '100%'
+            }).on('change', function() {
+                const value = select.val();
+                window.location.href = value
+                    ? element.dataset.urlTemplate.replace('__value__', encodeURIComponent(value))
+                    : element.dataset.clearUrl;
+            });
+        });
+    });
+}